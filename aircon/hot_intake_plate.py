@@ -1,5 +1,6 @@
 import cadquery as cq
 import math
+import numpy as np
 from util import *
 
 # All dimensions in mm
@@ -62,10 +63,9 @@ filter_zones          = 4
 filter_corner_radius  = max(2, plate_corner_radius - plate_wall_thickness)
 filter_bottom_chamfer = max(1, plate_edge_chamfer - plate_wall_thickness)
 filter_top_chamfer    = 1
+filter_direct_mesh    = True # Write the filter lines straight to STL triangles, skipping B-rep
 
-# It's pretty slow, so disable it when working on other parts
-generate_filter = True
-
+@feature_cache
 def plate_base():
     positive = (
         cq.Workplane("XY")
@@ -87,6 +87,7 @@ def plate_base():
     )
     return Feature(positive, negative)
 
+@feature_cache
 def tabs():
     return Feature(
         cq.Workplane("XY")
@@ -98,6 +99,7 @@ def tabs():
         .fillet(tab_length / 4)
     )
 
+@feature_cache
 def snap_fits(width, pitch, count, centre_to_wall, angle):
 
     def base_plane():
@@ -135,6 +137,7 @@ def snap_fits(width, pitch, count, centre_to_wall, angle):
     return Feature(positive, negative)
 
 
+@feature_cache
 def hose_cutout():
     plate_hole_diameter = hose_hole_diameter - fitting_thread_crest
     return Feature(
@@ -148,18 +151,24 @@ def hose_cutout():
             .circle(plate_hole_diameter / 2 + plate_edge_chamfer)
             .extrude(-plate_edge_chamfer - 0.0001)
             .faces("<Z").chamfer(plate_edge_chamfer)
-        ).union(
+        )
+    ).combine(pattern(
+        Feature(
             cq.Workplane()
             .workplane(offset=plate_wall_height)
-            .polarArray(hose_screw_ring / 2, 0, 360, hose_screw_count)
             .circle(hose_screw_loose / 2)
             .extrude(plate_bottom_thickness)
-            .polarArray(hose_screw_ring / 2, 0, 360, hose_screw_count)
-            .circle(hose_screw_cb_diameter / 2)
-            .extrude(hose_screw_cb_depth)
-        )
-    ).invert()
+            .union(
+                cq.Workplane()
+                .workplane(offset=plate_wall_height)
+                .circle(hose_screw_cb_diameter / 2)
+                .extrude(hose_screw_cb_depth)
+            )
+        ),
+        polar_locations(hose_screw_ring / 2, hose_screw_count)
+    )).invert()
 
+@feature_cache
 def hose_interlock_groove():
     return Feature(
         None,
@@ -173,16 +182,7 @@ def hose_interlock_groove():
         )
     )
 
-plate = resolve_features(
-    plate_base(),
-    tabs(),
-    hose_cutout(),
-    hose_interlock_groove().translateZ(plate_wall_height + plate_bottom_thickness),
-    snap_fits(top_snap_width, top_snap_pitch, top_snap_count, plate_height / 2, 0),
-    snap_fits(side_snap_width, 1, 1, plate_width / 2, 90),
-    snap_fits(side_snap_width, 1, 1, plate_width / 2, -90),
-)
-
+@feature_cache
 def fitting_base():
     ring_thickness = (fitting_diameter - hose_hole_diameter) / 2
     return Feature(
@@ -205,16 +205,20 @@ def fitting_base():
         )
     )
 
+@feature_cache
 def fitting_screw_holes():
-    return Feature(
-        cq.Workplane("XY")
-        .workplane(offset=fitting_length)
-        .polarArray(hose_screw_ring / 2, 0, 360, hose_screw_count)
-        .circle(hose_screw_tight / 2)
-        .extrude(-fitting_length * 0.5)
-    ).invert()
+    return pattern(
+        Feature(
+            cq.Workplane("XY")
+            .workplane(offset=fitting_length)
+            .circle(hose_screw_tight / 2)
+            .extrude(-fitting_length * 0.5)
+        ).invert(),
+        polar_locations(hose_screw_ring / 2, hose_screw_count)
+    )
 
 
+@feature_cache
 def fitting_thread():
     unthreaded_length = fitting_thread_pitch * 0.25
     return extruded_thread(
@@ -227,10 +231,11 @@ def fitting_thread():
         id_flat_fraction = 0.1
     ).translateZ(unthreaded_length / 2)
 
-def filter_plate():
+@feature_cache
+def filter_frame():
     zone_spacing_x = (filter_width  - 2 * filter_edge_width + filter_rib_width) / filter_zones
     zone_spacing_y = (filter_height - 2 * filter_edge_width + filter_rib_width) / filter_zones
-    base = (
+    return (
         cq.Workplane("XY")
         .rect(filter_width, filter_height)
         .extrude(filter_edge_thickness)
@@ -250,55 +255,81 @@ def filter_plate():
         .extrude(filter_rib_thickness)
         .faces("<Z").chamfer(filter_top_chamfer)
     )
+
+def filter_lines():
     count_x = round((filter_width - 2 * filter_edge_width) / filter_line_pitch)
     count_y = round((filter_height - 2 * filter_line_width) / filter_line_pitch)
+    lines = BoxMesh(np.zeros((0, 3)), np.zeros((0, 3)))
     for layer in range(round(filter_thickness / filter_line_thickness)):
-        # The epsilon here is to prevent the layers from touching, as that makes
-        # the CSG engine shit the bed
-        offset_z = -layer * filter_line_thickness * 1.01
         offset_xy = ((layer // 2) % 2) * (filter_line_pitch / 2)
         # Double pitch on first layer to allow space for line expansion due to build plate z variation
         layer_factor = 1 + (layer == 0)
-        base = base.faces(">Z").workplane(centerOption="CenterOfBoundBox", offset=offset_z)
-        base = base.center(offset_xy, offset_xy)
         if layer % 2 == 0:
-            base = (
-                base
-                .rarray(filter_line_pitch * layer_factor, 1, count_x // layer_factor, 1)
-                .rect(filter_line_width, filter_height - filter_edge_width)
-                .extrude(-filter_line_thickness)
+            layer_lines = line_boxes(
+                filter_line_pitch * layer_factor, count_x // layer_factor,
+                filter_line_width, filter_height - filter_edge_width, filter_line_thickness
             )
         else:
-            base = (
-                base
-                .rarray(1, filter_line_pitch * layer_factor, 1, count_y // layer_factor)
-                .rect(filter_width - filter_edge_width, filter_line_width)
-                .extrude(-filter_line_thickness)
+            layer_lines = line_boxes(
+                filter_line_pitch * layer_factor, count_y // layer_factor,
+                filter_line_width, filter_width - filter_edge_width, filter_line_thickness, along_x=True
             )
+        lines = lines.combine(
+            layer_lines.translate((offset_xy, offset_xy, filter_edge_thickness - layer * filter_line_thickness))
+        )
+    return lines
 
-    return base
+@feature_cache
+def filter_plate():
+    # Stack the layers on the frame rather than fusing them: each fuse was
+    # against an ever-growing solid, and needed the layers held slightly apart
+    # to stop the CSG engine failing.
+    return stack(filter_frame(), filter_lines().to_workplane())
 
-# Flip for correct print orientation. Note you will need tree supports for the
-# overhangs on the snaps and tabs. I recommend increasing line width for the
-# top/bottom skin to reduce print time. Test print was on K1 Max.
-plate = plate.rotate((0, 0, 0), (1, 0, 0), 180)
+# Mesh to a chord error of a quarter of a layer, rather than the exporter's
+# default of a fraction of each edge, which over-tessellates the large faces
+mesh_options = dict(tolerance=filter_line_thickness / 4, relative=False, angular_tolerance=0.5)
 
-safe_write_stl(plate, "hot_intake_plate.stl")
+# The booleans leave slivers and split edges on the plate's flat faces, which
+# compacting the mesh removes
+@part("hot_intake_plate.stl", compact=True, **mesh_options)
+def hot_intake_plate():
+    plate = resolve_features(
+        plate_base(),
+        tabs(),
+        hose_cutout(),
+        hose_interlock_groove().translateZ(plate_wall_height + plate_bottom_thickness),
+        snap_fits(top_snap_width, top_snap_pitch, top_snap_count, plate_height / 2, 0),
+        snap_fits(side_snap_width, 1, 1, plate_width / 2, 90),
+        snap_fits(side_snap_width, 1, 1, plate_width / 2, -90),
+    )
+    # Flip for correct print orientation. Note you will need tree supports for
+    # the overhangs on the snaps and tabs. I recommend increasing line width for
+    # the top/bottom skin to reduce print time. Test print was on K1 Max.
+    return plate.rotate((0, 0, 0), (1, 0, 0), 180)
 
-fitting = resolve_features(
-    fitting_base(),
-    hose_interlock_groove().rotate((1, 0, 0), 180).translateZ(fitting_length).invert(),
-    fitting_screw_holes(),
-    fitting_thread()
-)
+@part("hot_intake_fitting.stl", **mesh_options)
+def hot_intake_fitting():
+    return resolve_features(
+        fitting_base(),
+        hose_interlock_groove().rotate((1, 0, 0), 180).translateZ(fitting_length).invert(),
+        fitting_screw_holes(),
+        fitting_thread()
+    )
 
-safe_write_stl(fitting, "hot_intake_fitting.stl")
+# It's pretty slow, so a default run doesn't build or write it. It's built
+# when asked for, e.g. with
+# scripts/cqcad build aircon/hot_intake_plate.py --part hot_intake_filter
+# or when CQ-editor looks it up below.
+@part("hot_intake_filter.stl", default=False, **mesh_options)
+def hot_intake_filter():
+    if filter_direct_mesh:
+        return filter_frame(), filter_lines()
+    return filter_plate()
 
-if generate_filter:
-    filter = filter_plate()
-    safe_write_stl(filter, "hot_intake_filter.stl")
+parts = build_parts(parallel="show_object" not in globals())
 
 if "show_object" in globals():
-    show_object(plate)
-    show_object(fitting.rotate((0, 0, 0), (1, 0, 0), 0).translate((0, 0, -100)), options={"color": "red"})
-    if generate_filter: show_object(filter.translate((0, 0, 100)), options={"color": "blue"})
+    show_object(parts["hot_intake_plate"])
+    show_object(parts["hot_intake_fitting"].rotate((0, 0, 0), (1, 0, 0), 0).translate((0, 0, -100)), options={"color": "red"})
+    show_object(parts["hot_intake_filter"].translate((0, 0, 100)), options={"color": "blue"})
@@ -1,45 +1,140 @@
+import collections
+import functools
+import hashlib
+import inspect
+import io
+import itertools
+import math
+import multiprocessing
 import os
+import pickle
+import sysconfig
+import tempfile
+import time
+import types
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import cadquery as cq
+from OCP.BOPAlgo import BOPAlgo_GlueEnum
+from OCP.Bnd import Bnd_Box
+from OCP.BRep import BRep_Tool
+from OCP.BRepAlgoAPI import BRepAlgoAPI_Common, BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse
+from OCP.BRepBndLib import BRepBndLib
+from OCP.BRepBuilderAPI import BRepBuilderAPI_MakeFace
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepPrimAPI import BRepPrimAPI_MakeHalfSpace
+from OCP.BRepTools import BRepTools
+from OCP.TopAbs import TopAbs_Orientation
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopTools import TopTools_ListOfShape
+from OCP.gp import gp_Pln
+
+# When set, Feature.combine/invert/rotate/translate record a LazyFeature
+# expression instead of building B-reps immediately.
+lazy_features = False
+
+# Defaults for the options of the booleans run by Features and the functions
+# below, which also take them as keyword arguments. run_parallel lets OCCT
+# spread a boolean over all cores. fuzzy (mm), when not 0, treats sub-shapes
+# within that distance as coincident, rather than needing an epsilon to move
+# them clear. glue speeds up booleans of shapes which touch only at
+# coinciding faces: True (or "shift") when faces partly overlap, "full"
+# when they coincide exactly.
+boolean_options = dict(run_parallel=True, fuzzy=0, glue=False)
+
+glue_modes = {
+    False: BOPAlgo_GlueEnum.BOPAlgo_GlueOff,
+    True: BOPAlgo_GlueEnum.BOPAlgo_GlueShift,
+    "shift": BOPAlgo_GlueEnum.BOPAlgo_GlueShift,
+    "full": BOPAlgo_GlueEnum.BOPAlgo_GlueFull,
+}
+
+def boolean(op, shape, tools, **options):
+    """Run the boolean op ("fuse", "cut" or "common") of shape with a list of
+    tool Shapes, with options overriding boolean_options."""
+    unknown = set(options) - set(boolean_options)
+    if unknown:
+        raise TypeError(f"Unknown boolean options {', '.join(sorted(unknown))}")
+    options = {**boolean_options, **options}
+    algo = {"fuse": BRepAlgoAPI_Fuse, "cut": BRepAlgoAPI_Cut, "common": BRepAlgoAPI_Common}[op]()
+    arguments = TopTools_ListOfShape()
+    arguments.Append(shape.wrapped)
+    tool_list = TopTools_ListOfShape()
+    for tool in tools:
+        tool_list.Append(tool.wrapped)
+    algo.SetArguments(arguments)
+    algo.SetTools(tool_list)
+    algo.SetRunParallel(options["run_parallel"])
+    if options["fuzzy"]:
+        algo.SetFuzzyValue(options["fuzzy"])
+    algo.SetGlue(glue_modes[options["glue"]])
+    algo.Build()
+    return cq.Shape.cast(algo.Shape())
 
 class Feature:
     
     """A tuple of a body (the positive) and the cuts made when combining that
     body with another Feature (the negative). After combining features with
     Feature.combine(), call Feature.resolve() to subtract the union of all
-    negatives from the union of all positives."""
+    negatives from the union of all positives. options are boolean options
+    (see boolean_options) for every boolean the Feature takes part in, and
+    are carried through combines, with the other Feature's taking
+    precedence.
 
-    def __init__(self, positive, negative=None):
-        self.positive = positive
-        self.negative = negative
+    The positive and negative may be given as Workplanes, but only their
+    solids are kept, as Shapes, so that the Workplanes' history can be
+    freed. Use to_workplane() to get one back."""
 
-    def combine(self, other):
-        
-        def union_optional(lhs, rhs):
+    __slots__ = ("positive", "negative", "options")
+
+    def __init__(self, positive, negative=None, **options):
+        self.positive = as_shape(positive)
+        self.negative = as_shape(negative)
+        self.options = options
+
+    def combine(self, other, **options):
+        if lazy_features or isinstance(other, LazyFeature):
+            return self.lazy().combine(other)
+        options = {**self.options, **other.options, **options}
+
+        def union_optional(lhs, rhs, fuse):
             if lhs is None:
                 return rhs
             elif rhs is None:
                 return lhs
             else:
-                return lhs.union(rhs)
+                return fuse([lhs, rhs], **options)
         
         return Feature(
-            union_optional(self.positive, other.positive),
-            union_optional(self.negative, other.negative)
+            union_optional(self.positive, other.positive, fuse_shapes),
+            union_optional(self.negative, other.negative, fuse_negatives),
+            **{**self.options, **other.options}
         )
 
     def invert(self):
-        return Feature(self.negative, self.positive)
+        if lazy_features:
+            return self.lazy().invert()
+        return Feature(self.negative, self.positive, **self.options)
 
     def rotate(self, axis, angle):
-        return Feature(
-            None if self.positive is None else self.positive.rotate((0, 0, 0), axis, angle),
-            None if self.negative is None else self.negative.rotate((0, 0, 0), axis, angle)
-        )
+        if lazy_features:
+            return self.lazy().rotate(axis, angle)
+        return self.move(cq.Location(cq.Vector(0, 0, 0), cq.Vector(axis), angle))
 
     def translate(self, vec):
+        if lazy_features:
+            return self.lazy().translate(vec)
+        return self.move(cq.Location(cq.Vector(vec)))
+
+    def move(self, loc):
+        """Locate the positive and negative with loc, sharing their B-rep."""
+        if lazy_features:
+            return self.lazy().move(loc)
         return Feature(
-            None if self.positive is None else self.positive.translate(vec),
-            None if self.negative is None else self.negative.translate(vec)
+            None if self.positive is None else self.positive.moved(loc),
+            None if self.negative is None else self.negative.moved(loc),
+            **self.options
         )
 
     def translateX(self, x):
@@ -51,26 +146,1193 @@ class Feature:
     def translateZ(self, z):
         return self.translate((0, 0, z))
 
-    def resolve(self):
+    def resolve(self, **options):
         if self.negative is None:
-            return self.positive
+            return to_workplane(self.positive)
+        return to_workplane(resolve_shapes([self.positive], [self.negative], **{**self.options, **options}))
+
+    def lazy(self):
+        return LazyFeature("leaf", (), self)
+
+
+class LazyFeature:
+
+    """A Feature expression which is only evaluated on resolve(). Transforms
+    are applied as locations rather than copies of the B-rep, nested combines
+    are flattened into a single fuse of all positives and a single fuse of all
+    negatives, and subexpressions shared by several parents are evaluated
+    once."""
+
+    __slots__ = ("op", "children", "arg", "options")
+
+    def __init__(self, op, children, arg=None):
+        self.op = op
+        self.children = children
+        self.arg = arg
+        if op == "leaf":
+            self.options = arg.options
         else:
-            return self.positive - self.negative
+            self.options = {k: v for child in children for k, v in child.options.items()}
+
+    def combine(self, other):
+        if not isinstance(other, LazyFeature):
+            other = other.lazy()
+        children = []
+        for f in (self, other):
+            children.extend(f.children if f.op == "combine" else (f,))
+        return LazyFeature("combine", tuple(children))
+
+    def invert(self):
+        if self.op == "invert":
+            return self.children[0]
+        return LazyFeature("invert", (self,))
+
+    def move(self, loc):
+        if self.op == "move":
+            return LazyFeature("move", self.children, loc * self.arg)
+        return LazyFeature("move", (self,), loc)
+
+    def rotate(self, axis, angle):
+        return self.move(cq.Location(cq.Vector(0, 0, 0), cq.Vector(axis), angle))
+
+    def translate(self, vec):
+        return self.move(cq.Location(cq.Vector(vec)))
+
+    def translateX(self, x):
+        return self.translate((x, 0, 0))
+
+    def translateY(self, y):
+        return self.translate((0, y, 0))
+
+    def translateZ(self, z):
+        return self.translate((0, 0, z))
+
+    def evaluate(self, memo):
+        """Return lists of the positive and negative solids of this expression,
+        using memo (keyed on node identity) to skip shared subexpressions."""
+        if id(self) in memo:
+            return memo[id(self)]
+        if self.op == "leaf":
+            result = (
+                [] if self.arg.positive is None else [self.arg.positive],
+                [] if self.arg.negative is None else [self.arg.negative]
+            )
+        elif self.op == "invert":
+            positive, negative = self.children[0].evaluate(memo)
+            result = (negative, positive)
+        elif self.op == "move":
+            positive, negative = self.children[0].evaluate(memo)
+            result = (
+                [s.moved(self.arg) for s in positive],
+                [s.moved(self.arg) for s in negative]
+            )
+        else:
+            result = ([], [])
+            for child in self.children:
+                positive, negative = child.evaluate(memo)
+                result[0].extend(positive)
+                result[1].extend(negative)
+        memo[id(self)] = result
+        return result
+
+    def resolve(self, **options):
+        return to_workplane(resolve_shapes(*self.evaluate({}), **{**self.options, **options}))
+
+    def flatten(self, **options):
+        """Evaluate to a plain Feature, without performing the final cut."""
+        positive, negative = self.evaluate({})
+        options = {**self.options, **options}
+        return Feature(fuse_shapes(positive, **options), fuse_negatives(negative, **options), **self.options)
+
+
+def as_shape(obj):
+    """The solids of a Workplane as a Shape (a Compound if there are several),
+    or a Shape (or None) as it is."""
+    if isinstance(obj, cq.Workplane):
+        return obj.findSolid()
+    return obj
+
+def to_workplane(shape):
+    """A new Workplane holding shape, or None for None."""
+    if shape is None:
+        return None
+    return cq.Workplane("XY").newObject([shape])
+
+def bounding_box(shape):
+    """A quick, conservative bounding box (a Bnd_Box) for culling booleans.
+    Unlike Shape.BoundingBox() this doesn't mesh or optimise the box."""
+    box = Bnd_Box()
+    BRepBndLib.Add_s(shape.wrapped, box, False)
+    box.Enlarge(1e-3)
+    return box
+
+def solids(shapes):
+    """The solids of a list of Shapes, with Compounds (from pattern() or
+    fuse_shapes()) split up. OCCT doesn't intersect the solids within one
+    boolean argument with each other, so touching or overlapping copies in
+    a single Compound give an invalid or uncut result."""
+    return [s for shape in shapes for s in shape.Solids()]
+
+def fuse_shapes(shapes, **options):
+    """Union any number of Shapes with a single multi-argument fuse, rather
+    than folding them together one union at a time. Each solid is a
+    separate argument (see solids()), and those whose bounding boxes don't
+    touch any other's are left out of the fuse and gathered into a Compound
+    with its result. Returns None if there is nothing to fuse. options are
+    passed to boolean()."""
+    shapes = solids(shapes)
+    if len(shapes) == 0:
+        return None
+    elif len(shapes) == 1:
+        return shapes[0]
+    boxes = [bounding_box(s) for s in shapes]
+    touching = [
+        any(not a.IsOut(b) for j, b in enumerate(boxes) if j != i)
+        for i, a in enumerate(boxes)
+    ]
+    fused = [s for s, t in zip(shapes, touching) if t]
+    apart = [s for s, t in zip(shapes, touching) if not t]
+    if len(fused) >= 2:
+        fused = [boolean("fuse", fused[0], fused[1:], **options).clean()]
+    else:
+        phase_times["booleans saved"] += 1
+    if len(apart) == 0:
+        return fused[0]
+    return cq.Compound.makeCompound(fused + apart)
+
+def resolve_shapes(positives, negatives, **options):
+    """Subtract the union of negatives from the union of positives (lists of
+    Shapes), returning a Shape. Negatives whose bounding boxes miss every
+    positive's can't change the result, so are dropped before fusing.
+    Half-spaces aren't fused with the other negatives (OCCT gets that
+    wrong), but are passed to the same cut. options are passed to
+    boolean()."""
+    finite, half_spaces = split_half_spaces(solids(negatives))
+    boxes = [bounding_box(p) for p in positives]
+    kept = [n for n in finite if any(not b.IsOut(bounding_box(n)) for b in boxes)]
+    phase_times["negatives culled"] += len(finite) - len(kept)
+    if len(finite) >= 2 and len(kept) < 2:
+        phase_times["booleans saved"] += 1
+    positive = fuse_shapes(positives, **options)
+    if len(kept) + len(half_spaces) == 0:
+        if len(negatives) > 0:
+            phase_times["booleans saved"] += 1
+        return positive
+    tools = half_spaces if len(kept) == 0 else [fuse_shapes(kept, **options)] + half_spaces
+    return boolean("cut", positive, tools, **options).clean()
+
+def half_space(origin=(0, 0, 0), normal=(0, 0, 1)):
+    """Workplane holding the infinite solid on the side of the plane through
+    origin which normal points to, for slicing a part flat without a cut
+    against a big box. See clip()."""
+    origin = cq.Vector(origin)
+    normal = cq.Vector(normal)
+    face = BRepBuilderAPI_MakeFace(gp_Pln(origin.toPnt(), normal.toDir())).Face()
+    solid = BRepPrimAPI_MakeHalfSpace(face, (origin + normal).toPnt()).Solid()
+    return cq.Workplane("XY").newObject([cq.Solid(solid)])
+
+def is_half_space(shape):
+    # A finite solid can't be bounded by a single plane
+    faces = shape.Faces()
+    return len(faces) == 1 and faces[0].geomType() == "PLANE"
+
+def split_half_spaces(shapes):
+    """Separate the half-spaces in a list of Shapes, including those gathered
+    into Compounds by fuse_negatives() or pattern(), from the rest. Returns
+    a list of the other Shapes and a list of the half-spaces."""
+    finite = []
+    half_spaces = []
+    for shape in shapes:
+        solids = shape.Solids()
+        if not any(is_half_space(s) for s in solids):
+            finite.append(shape)
+            continue
+        half_spaces.extend(s for s in solids if is_half_space(s))
+        rest = [s for s in solids if not is_half_space(s)]
+        if rest:
+            finite.append(cq.Compound.makeCompound(rest))
+    return finite, half_spaces
+
+def fuse_negatives(shapes, **options):
+    """As fuse_shapes(), for negatives: half-spaces are kept out of the fuse
+    and gathered into a Compound with its result, for resolve_shapes() to
+    pass to its cut separately."""
+    finite, half_spaces = split_half_spaces(shapes)
+    fused = fuse_shapes(finite, **options)
+    if not half_spaces:
+        return fused
+    return cq.Compound.makeCompound(([] if fused is None else [fused]) + half_spaces)
+
+def clip(origin=(0, 0, 0), normal=(0, 0, 1)):
+    """Feature keeping only what is on the side of the plane through origin
+    which normal points to, e.g. clip() to trim a part flat at z = 0. When
+    resolved with other Features it costs no extra boolean, as it joins the
+    cut of their negatives."""
+    return Feature(None, half_space(origin, -cq.Vector(normal)))
+
+def feature_options(features):
+    return {k: v for f in features for k, v in f.options.items()}
+
+def combine_features(*varg, **options):
+    if lazy_features or any(isinstance(f, LazyFeature) for f in varg):
+        accum = LazyFeature("combine", ())
+        for arg in varg:
+            accum = accum.combine(arg)
+        return accum
+    carried = feature_options(varg)
+    options = {**carried, **options}
+    return Feature(
+        fuse_shapes([f.positive for f in varg if f.positive is not None], **options),
+        fuse_negatives([f.negative for f in varg if f.negative is not None], **options),
+        **carried
+    )
+
+def resolve_features(*varg, cells=None, **options):
+    """Combine and resolve Features, with boolean options overriding those
+    the Features carry. If cells is given as (nx, ny), the part is instead
+    resolved cell by cell with resolve_partitioned()."""
+    if lazy_features or any(isinstance(f, LazyFeature) for f in varg):
+        return combine_features(*varg).resolve(**options)
+    options = {**feature_options(varg), **options}
+    positives = [f.positive for f in varg if f.positive is not None]
+    negatives = [f.negative for f in varg if f.negative is not None]
+    if cells is not None:
+        return to_workplane(resolve_partitioned(positives, negatives, cells, **options))
+    return to_workplane(resolve_shapes(positives, negatives, **options))
+
+# Shapes for the cells of the current resolve_partitioned() call, inherited
+# by its forked workers
+partition_job = None
+
+def resolve_cell(i):
+    positive, negatives, cells, options = partition_job
+    piece = boolean("common", positive, [cells[i]], **options)
+    if len(piece.Solids()) == 0:
+        return None
+    box = bounding_box(cells[i])
+    piece = resolve_shapes([piece], [n for n in negatives if not box.IsOut(bounding_box(n))], **options)
+    if len(piece.Solids()) == 0:
+        return None
+    return to_brep(piece)
+
+def resolve_partitioned(positives, negatives, cells=(2, 2), parallel=True, **options):
+    """As resolve_shapes(), but split the fused positive into a grid of
+    cells = (nx, ny) in XY, cut each cell by the negatives which reach it,
+    in parallel on forked workers, then glue the cells back together. Local
+    cuts on a big part then each run against a small piece of it. Falls back
+    to resolve_shapes() if the split fails or the joined shape is invalid or
+    has lost volume."""
+    global partition_job
+    positive = fuse_shapes(positives, **options)
+    try:
+        bb = positive.BoundingBox()
+        nx, ny = cells
+        xs = [bb.xmin + (bb.xmax - bb.xmin) * i / nx for i in range(nx + 1)]
+        ys = [bb.ymin + (bb.ymax - bb.ymin) * j / ny for j in range(ny + 1)]
+        # Outer cells overhang the part so nothing is lost at its edges
+        margin = 1 + max(bb.xlen, bb.ylen, bb.zlen)
+        xs[0] -= margin
+        ys[0] -= margin
+        xs[-1] += margin
+        ys[-1] += margin
+        boxes = [
+            cq.Solid.makeBox(
+                xs[i + 1] - xs[i], ys[j + 1] - ys[j], bb.zlen + 2 * margin,
+                cq.Vector(xs[i], ys[j], bb.zmin - margin)
+            )
+            for i in range(nx) for j in range(ny)
+        ]
+        partition_job = (positive, negatives, boxes, options)
+        workers = min(len(boxes), os.cpu_count() or 1)
+        if parallel and workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+                pieces = list(pool.map(resolve_cell, range(len(boxes))))
+        else:
+            pieces = [resolve_cell(i) for i in range(len(boxes))]
+        pieces = [from_brep(p).val() for p in pieces if p is not None]
+        joined = boolean("fuse", pieces[0], pieces[1:], **{**options, "glue": True}).clean() if len(pieces) > 1 else pieces[0]
+        volume = sum(p.Volume() for p in pieces)
+        if joined.isValid() and abs(joined.Volume() - volume) <= 1e-6 * volume:
+            return joined
+        print("resolve_partitioned: joined shape failed checks, resolving serially")
+    except Exception as e:
+        print(f"resolve_partitioned: split failed ({e}), resolving serially")
+    finally:
+        partition_job = None
+    return resolve_shapes(positives, negatives, **options)
+
+def polar_locations(radius, count, start_angle=0, angle=360):
+    """Locations spaced around a circle about the Z axis, each rotated to face
+    outwards, as for Workplane.polarArray()."""
+    if abs(math.remainder(angle, 360)) < 1e-9:
+        step = angle / count
+    else:
+        step = angle / (count - 1) if count > 1 else 0
+    locations = []
+    for i in range(count):
+        phi = start_angle + step * i
+        locations.append(cq.Location(
+            cq.Vector(radius * math.cos(math.radians(phi)), radius * math.sin(math.radians(phi)), 0),
+            cq.Vector(0, 0, 1),
+            phi
+        ))
+    return locations
+
+def grid_locations(x_spacing, y_spacing, x_count, y_count):
+    """Locations on a grid centred on the origin, as for Workplane.rarray()."""
+    return [
+        cq.Location(cq.Vector((i - (x_count - 1) / 2) * x_spacing, (j - (y_count - 1) / 2) * y_spacing, 0))
+        for i in range(x_count) for j in range(y_count)
+    ]
+
+def pattern(feature, locations):
+    """Place a copy of feature, built once about the origin, at each of
+    locations (see polar_locations() and grid_locations()). The copies share
+    the feature's B-rep and are gathered into a Compound rather than fused.
+    Booleans take each copy as a separate argument, fusing only those whose
+    bounding boxes touch, so cutting a pattern is usually a single boolean
+    with every copy as a tool."""
+    if isinstance(feature, LazyFeature):
+        feature = feature.flatten()
+    def place(shape):
+        if shape is None:
+            return None
+        return cq.Compound.makeCompound([shape.moved(loc) for loc in locations])
+    return Feature(place(feature.positive), place(feature.negative), **feature.options)
+
+def to_brep(obj):
+    """Serialise a Shape, or the solids of a Workplane, to binary BREP bytes."""
+    if obj is None:
+        return None
+    buf = io.BytesIO()
+    as_shape(obj).exportBin(buf)
+    return buf.getvalue()
+
+def from_brep(data):
+    if data is None:
+        return None
+    return to_workplane(cq.Shape.importBin(io.BytesIO(data)))
+
+class BrepCache:
+
+    """On-disk cache for functions returning a Feature or a Workplane. Use an
+    instance as a decorator. Results are stored as binary BREP, keyed on the
+    function arguments, the source of util and of the functions and classes
+    it uses, the current values of the module-level parameters they read
+    (including shapes, by their BREP), and boolean_options. A function which
+    reads a global the key can't capture isn't cached, with a warning.
+    Least-recently-used entries are evicted once the cache exceeds max_bytes."""
 
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        # Results already loaded or built by this process, so that a long-lived
+        # process (e.g. scripts/watch.py) can skip even the disk read.
+        self.memory = collections.OrderedDict()
+        self.memory_entries = 256
+        self.util_digest = None
+        self.uncached = set()
 
-def combine_features(*varg):
-    accum = Feature(None)
-    for arg in varg:
-        accum = accum.combine(arg)
-    return accum
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            try:
+                key = self.key(func, args, kwargs)
+            except TypeError as e:
+                if func.__name__ not in self.uncached:
+                    self.uncached.add(func.__name__)
+                    print(f"feature_cache: not caching {func.__name__}(), {e}")
+                return func(*args, **kwargs)
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            fname = os.path.join(self.path, key + ".cqb")
+            try:
+                with open(fname, "rb") as f:
+                    entry = pickle.load(f)
+                os.utime(fname)
+                self.hits += 1
+                return self.remember(key, self.unpack(entry))
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            self.misses += 1
+            result = func(*args, **kwargs)
+            self.store(fname, self.pack(result))
+            return self.remember(key, result)
+        wrapper.cache = self
+        return wrapper
 
-def resolve_features(*varg):
-    return combine_features(*varg).resolve()
+    def remember(self, key, result):
+        self.memory[key] = result
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+        return result
 
-# Workaround issue with fstl reading the file mid-rewrite
-def safe_write_stl(obj, fname):
-    cq.exporters.export(obj, fname + ".tmp", exportType="STL")
-    os.replace(fname + ".tmp", fname)
+    def key(self, func, args, kwargs):
+        """The cache key for calling func with args and kwargs. Raises
+        TypeError if func reads a global which can't be hashed."""
+        if self.util_digest is None:
+            with open(__file__, "rb") as f:
+                self.util_digest = hashlib.sha256(f.read()).hexdigest()
+        h = hashlib.sha256()
+        h.update(cq.__version__.encode())
+        # Covers Feature, BoxMesh, boolean() and the rest of util, which
+        # hash_dependencies() doesn't descend into
+        h.update(self.util_digest.encode())
+        h.update(stable_repr((boolean_options, lazy_features)).encode())
+        h.update(repr((args, sorted(kwargs.items()))).encode())
+        self.hash_dependencies(func, h, set())
+        return func.__name__ + "-" + h.hexdigest()[:32]
+
+    def hash_dependencies(self, func, h, visited):
+        func = getattr(func, "__wrapped__", func)
+        if func in visited:
+            return
+        visited.add(func)
+        try:
+            h.update(inspect.getsource(func).encode())
+        except (OSError, TypeError):
+            h.update(func.__code__.co_code)
+        for name in sorted(global_names(func.__code__)):
+            if name not in func.__globals__:
+                continue
+            value = func.__globals__[name]
+            unwrapped = getattr(value, "__wrapped__", value)
+            if isinstance(value, types.ModuleType):
+                h.update(f"{name}=module {value.__name__};".encode())
+            elif isinstance(unwrapped, (types.FunctionType, type)) and unwrapped.__module__ == __name__:
+                h.update(f"{name}=util.{unwrapped.__qualname__};".encode())
+            elif isinstance(unwrapped, types.FunctionType) and user_code(unwrapped):
+                self.hash_dependencies(value, h, visited)
+            elif isinstance(unwrapped, type) and user_code(unwrapped):
+                self.hash_class(unwrapped, h, visited)
+            elif callable(value) and not isinstance(value, (Feature, LazyFeature, cq.Shape, cq.Workplane)):
+                # Library functions and classes, which change with their
+                # package rather than the scripts
+                h.update(f"{name}={getattr(value, '__module__', '')}.{getattr(value, '__qualname__', '')};".encode())
+            else:
+                try:
+                    h.update(f"{name}={stable_repr(value)};".encode())
+                except TypeError:
+                    raise TypeError(f"as it reads {name}, a {type(value).__name__}") from None
+
+    def hash_class(self, cls, h, visited):
+        if cls in visited:
+            return
+        visited.add(cls)
+        h.update(f"class {cls.__qualname__};".encode())
+        for base in cls.__mro__[1:]:
+            if user_code(base):
+                self.hash_class(base, h, visited)
+        for name, attr in sorted(vars(cls).items()):
+            if isinstance(attr, (staticmethod, classmethod)):
+                attr = attr.__func__
+            if isinstance(attr, property):
+                for accessor in (attr.fget, attr.fset, attr.fdel):
+                    if accessor is not None:
+                        self.hash_dependencies(accessor, h, visited)
+            elif isinstance(attr, types.FunctionType):
+                self.hash_dependencies(attr, h, visited)
+            elif not name.startswith("__"):
+                try:
+                    h.update(f"{name}={stable_repr(attr)};".encode())
+                except TypeError:
+                    raise TypeError(f"as {cls.__qualname__}.{name} is a {type(attr).__name__}") from None
+
+    @staticmethod
+    def pack(result):
+        if isinstance(result, LazyFeature):
+            result = result.flatten()
+        if isinstance(result, Feature):
+            return ("feature", to_brep(result.positive), to_brep(result.negative), result.options)
+        return ("workplane", to_brep(result), None)
+
+    @staticmethod
+    def unpack(entry):
+        kind, positive, negative, *options = entry
+        if kind == "feature":
+            return Feature(from_brep(positive), from_brep(negative), **(options[0] if options else {}))
+        return from_brep(positive)
+
+    def store(self, fname, entry):
+        # Other processes (forked part workers, daemon workers) may be storing
+        # the same entry, or evicting, at the same time
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp, fname)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        entries = []
+        for e in os.scandir(self.path):
+            if e.name.endswith(".cqb"):
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, e.path, st.st_size))
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        size = 0
+        if os.path.isdir(self.path):
+            for e in os.scandir(self.path):
+                if e.name.endswith(".cqb"):
+                    try:
+                        size += e.stat().st_size
+                    except FileNotFoundError:
+                        pass
+        return f"{self.hits} hits, {self.misses} misses, {size / 1e6:.1f} MB on disk"
+
+library_paths = tuple(
+    os.path.abspath(sysconfig.get_paths()[k]) + os.sep for k in ("stdlib", "platstdlib", "purelib", "platlib")
+)
+
+def user_code(obj):
+    """Whether a function or class was defined in a script or a module next
+    to it, rather than in the standard library or an installed package."""
+    if isinstance(obj, type):
+        functions = [f for f in vars(obj).values() if isinstance(f, types.FunctionType)]
+        if not functions:
+            return False
+        obj = functions[0]
+    path = os.path.abspath(obj.__code__.co_filename)
+    return not path.startswith(library_paths) and "site-packages" not in path and "dist-packages" not in path
+
+def stable_repr(value):
+    """A string identifying the value of a module-level parameter, for cache
+    keys. Shapes, Workplanes and Features are identified by a hash of their
+    BREP. Raises TypeError for other types."""
+    if isinstance(value, (int, float, complex, str, bytes, type(None))):
+        return repr(value)
+    elif isinstance(value, (tuple, list)):
+        return f"{type(value).__name__}({', '.join(stable_repr(v) for v in value)})"
+    elif isinstance(value, (set, frozenset)):
+        return f"{type(value).__name__}({', '.join(sorted(stable_repr(v) for v in value))})"
+    elif isinstance(value, dict):
+        return f"dict({', '.join(sorted(f'{stable_repr(k)}: {stable_repr(v)}' for k, v in value.items()))})"
+    elif isinstance(value, np.ndarray):
+        return f"array({value.dtype}, {value.shape}, {hashlib.sha256(value.tobytes()).hexdigest()})"
+    elif isinstance(value, cq.Vector):
+        return f"Vector{value.toTuple()!r}"
+    elif isinstance(value, cq.Location):
+        return f"Location{value.toTuple()!r}"
+    elif isinstance(value, (cq.Shape, Feature, LazyFeature)):
+        return f"brep({hashlib.sha256(pickle.dumps(BrepCache.pack(value))).hexdigest()})"
+    elif isinstance(value, cq.Workplane):
+        shapes = [v for v in value.vals() if isinstance(v, cq.Shape)]
+        return stable_repr(cq.Compound.makeCompound(shapes))
+    raise TypeError(f"can't hash a {type(value).__name__}")
+
+def global_names(code):
+    """All global names read by a code object, including nested functions."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= global_names(const)
+    return names
+
+feature_cache = BrepCache(
+    os.environ.get("CQCAD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cqcad")),
+    1 << 30
+)
+
+class BoxMesh:
+
+    """A set of axis-aligned boxes, held as arrays of centres and sizes, which
+    can be written straight to STL triangles without going through B-rep. For
+    regular lattices, where every box would otherwise become its own solid."""
+
+    def __init__(self, centres, sizes):
+        self.centres = np.asarray(centres, dtype=float).reshape(-1, 3)
+        self.sizes = np.broadcast_to(np.asarray(sizes, dtype=float), self.centres.shape)
+
+    # Corner k of a box is at (k & 1, k >> 1 & 1, k >> 2 & 1), and each face is
+    # two triangles wound anticlockwise when viewed from outside.
+    corners = np.array([[(k >> axis) & 1 for axis in range(3)] for k in range(8)]) - 0.5
+    faces = np.array([
+        (0, 4, 6), (0, 6, 2), (1, 3, 7), (1, 7, 5),
+        (0, 1, 5), (0, 5, 4), (2, 6, 7), (2, 7, 3),
+        (0, 2, 3), (0, 3, 1), (4, 5, 7), (4, 7, 6),
+    ])
+
+    def combine(self, other):
+        return BoxMesh(
+            np.concatenate([self.centres, other.centres]),
+            np.concatenate([self.sizes, other.sizes])
+        )
+
+    def translate(self, vec):
+        return BoxMesh(self.centres + vec, self.sizes)
+
+    def triangles(self):
+        """An (N, 3, 3) array of triangle vertices."""
+        vertices = self.centres[:, None, :] + self.sizes[:, None, :] * BoxMesh.corners
+        return vertices[:, BoxMesh.faces].reshape(-1, 3, 3)
+
+    def to_workplane(self):
+        """The same boxes as B-rep, e.g. for show_object()."""
+        return cq.Workplane("XY").newObject([cq.Compound.makeCompound([
+            cq.Solid.makeBox(*size, pnt=cq.Vector(*(centre - size / 2)))
+            for centre, size in zip(self.centres, self.sizes)
+        ])])
+
+def line_boxes(pitch, count, line_width, line_length, thickness, along_x=False):
+    """A layer of count parallel lines, pitch apart, running along Y (or X)
+    and hanging down from Z = 0."""
+    offsets = (np.arange(count) - (count - 1) / 2) * pitch
+    centres = np.zeros((count, 3))
+    centres[:, 1 if along_x else 0] = offsets
+    centres[:, 2] = -thickness / 2
+    if along_x:
+        return BoxMesh(centres, (line_length, line_width, thickness))
+    return BoxMesh(centres, (line_width, line_length, thickness))
+
+def stack(*workplanes):
+    """Gather the solids of several Workplanes into one compound, without any
+    boolean. For parts like layered lattices, whose pieces only overlap where
+    they are meant to bond, and which the slicer merges anyway."""
+    return cq.Workplane("XY").newObject([
+        cq.Compound.makeCompound([s for wp in workplanes for s in wp.solids().vals()])
+    ])
+
+def mesh_shape(obj, tolerance=0.1, angular_tolerance=0.1, relative=True):
+    """Triangulate a Shape or Workplane with OCC's parallel BRepMesh, replacing
+    any existing triangulation, and return it as a Shape. tolerance is the
+    linear deflection in mm, or a fraction of each edge's length if relative
+    is set (as cq.exporters.export does); angular_tolerance is in radians.
+
+    Without relative, every face is meshed to the same chord error, which
+    should be tied to the printer's resolution. The number of segments
+    around a curve then follows its radius, so planes and large fillets get
+    few triangles, while threads stay within the same error and
+    angular_tolerance bounds small holes. (Meshing each face separately, with
+    its own deflection, would leave cracks along shared edges.)"""
+    shape = obj if isinstance(obj, cq.Shape) else cq.Compound.makeCompound(list(obj))
+    BRepTools.Clean_s(shape.wrapped)
+    BRepMesh_IncrementalMesh(shape.wrapped, tolerance, relative, angular_tolerance, True)
+    return shape
+
+def shape_triangles(obj, tolerance=0.1, angular_tolerance=0.1, relative=True):
+    """Tessellate a Shape or Workplane into an (N, 3, 3) array of triangle
+    vertices, using the same default tolerances as cq.exporters.export."""
+    return triangulation(mesh_shape(obj, tolerance, angular_tolerance, relative))
+
+def triangulation(shape):
+    """The existing triangulation of a Shape as an (N, 3, 3) array."""
+    faces = []
+    for f in shape.Faces():
+        loc = TopLoc_Location()
+        poly = BRep_Tool.Triangulation_s(f.wrapped, loc)
+        if poly is None:
+            continue
+        trsf = loc.Transformation()
+        nodes = np.array([
+            poly.Node(i).Transformed(trsf).Coord() for i in range(1, poly.NbNodes() + 1)
+        ])
+        order = (1, 3, 2) if f.wrapped.Orientation() == TopAbs_Orientation.TopAbs_REVERSED else (1, 2, 3)
+        indices = np.array([
+            [t.Value(j) for j in order] for t in (poly.Triangle(i) for i in range(1, poly.NbTriangles() + 1))
+        ])
+        faces.append(nodes[indices - 1])
+    return np.concatenate(faces) if faces else np.zeros((0, 3, 3))
+
+stl_record = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+def write_stl_triangles(triangles, fname):
+    """Write an (N, 3, 3) array of triangle vertices as binary STL."""
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records = np.zeros(len(triangles), dtype=stl_record)
+    records["normal"] = normals
+    records["vertices"] = triangles
+    with open(fname, "wb") as f:
+        f.write(b"\0" * 80)
+        f.write(np.uint32(len(records)).tobytes())
+        f.write(records.tobytes())
+
+threemf_content_types = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+
+threemf_rels = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+
+def snap_vertices(triangles, tolerance=1e-6):
+    """Move the vertices of an (N, 3, 3) triangle array which are within
+    tolerance (mm) of each other on every axis onto one of them, dropping any
+    triangles this collapses. OCC can put the end of an edge shared by two
+    faces about 1e-15 apart in their meshes, which rounding to float32 for
+    STL may then split, opening a seam."""
+    points, indices = np.unique(np.asarray(triangles, dtype=float).reshape(-1, 3), axis=0, return_inverse=True)
+    indices = indices.reshape(-1, 3)
+    # Points this close share a cell on each axis of one of two grids offset
+    # by half a cell, so of one of 8 grids. Join each cell's points under
+    # its lowest label until nothing changes.
+    labels = np.arange(len(points))
+    changed = True
+    while changed:
+        changed = False
+        for shift in itertools.product((0, 0.5), repeat=3):
+            cells = np.floor(points / (2 * tolerance) + shift).astype(np.int64)
+            _, cell = np.unique(cells, axis=0, return_inverse=True)
+            lowest = np.full(cell.max() + 1, len(points))
+            np.minimum.at(lowest, cell, labels)
+            if (lowest[cell] < labels).any():
+                labels = lowest[cell]
+                changed = True
+    indices = labels[indices]
+    indices = indices[
+        (indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2]) & (indices[:, 2] != indices[:, 0])
+    ]
+    return points[indices]
+
+def weld_vertices(triangles):
+    """Index an (N, 3, 3) triangle array, merging vertices which are equal
+    as float32 (as written to STL), and dropping any triangles this collapses.
+    Each vertex is compared as one 12-byte key, so np.unique sorts a single
+    column rather than comparing rows axis by axis.
+    Returns an array of vertices and an (M, 3) array of indices into it."""
+    # Adding 0.0 turns -0.0 into 0.0, which has different bytes
+    points = np.ascontiguousarray(np.asarray(triangles, dtype=np.float32).reshape(-1, 3) + np.float32(0))
+    _, first, indices = np.unique(
+        points.view(np.dtype((np.void, 12))).ravel(), return_index=True, return_inverse=True
+    )
+    indices = indices.reshape(-1, 3)
+    indices = indices[
+        (indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2]) & (indices[:, 2] != indices[:, 0])
+    ]
+    return points[first], indices
+
+def ear_clip(points, polygon, normal):
+    """Triangulate a simple polygon, given as vertex indices anticlockwise
+    about normal, by clipping ears. Returns a list of index triples, or None
+    if that would need a degenerate triangle."""
+    u = np.cross(normal, (1, 0, 0) if abs(normal[0]) < 0.9 else (0, 1, 0))
+    u /= np.linalg.norm(u)
+    xy = {i: (points[i] @ u, points[i] @ np.cross(normal, u)) for i in polygon}
+    def area(a, b, c):
+        (ax, ay), (bx, by), (cx, cy) = xy[a], xy[b], xy[c]
+        return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    remaining = list(polygon)
+    result = []
+    while len(remaining) > 3:
+        for k in range(len(remaining)):
+            a, b, c = remaining[k - 1], remaining[k], remaining[(k + 1) % len(remaining)]
+            if area(a, b, c) <= 1e-12:
+                continue
+            if any(
+                area(a, b, p) >= 0 and area(b, c, p) >= 0 and area(c, a, p) >= 0
+                for p in remaining if p not in (a, b, c)
+            ):
+                continue
+            result.append((a, b, c))
+            del remaining[k]
+            break
+        else:
+            return None
+    if len(remaining) == 3:
+        if area(*remaining) <= 1e-12:
+            return None
+        result.append(tuple(remaining))
+    return result
+
+def refill_fan(points, centre, edges, tolerance):
+    """Triangles covering the fan of triangles (centre, a, b) around a vertex,
+    given as their edges (a, b), without using the centre. Possible when the
+    fan is flat, or folds along a straight crease through the centre, to
+    within tolerance. Returns None otherwise."""
+    edges = np.asarray(edges)
+    a = points[edges[:, 0]] - points[centre]
+    b = points[edges[:, 1]] - points[centre]
+    normals = np.cross(a, b)
+    areas = np.linalg.norm(normals, axis=1)
+    # Group the triangles by plane, taking the largest left as each reference
+    unassigned = np.ones(len(edges), dtype=bool)
+    groups = []
+    while unassigned.any():
+        if len(groups) == 2:
+            return None
+        largest = np.flatnonzero(unassigned)[np.argmax(areas[unassigned])]
+        if areas[largest] == 0:
+            return None
+        n = normals[largest] / areas[largest]
+        members = unassigned & (np.abs(a @ n) <= tolerance) & (np.abs(b @ n) <= tolerance)
+        unassigned &= ~members
+        groups.append((n, edges[members].tolist()))
+
+    result = []
+    for n, group in groups:
+        following = dict(group)
+        if len(following) != len(group):
+            return None
+        starts = set(following) - set(following.values())
+        if len(groups) == 1 and not starts:
+            # A flat fan all the way round
+            polygon = [group[0][0]]
+        elif len(groups) == 2 and len(starts) == 1:
+            # One side of a crease, from one neighbour along it to the other
+            polygon = [starts.pop()]
+        else:
+            return None
+        while following.get(polygon[-1], polygon[0]) != polygon[0]:
+            polygon.append(following[polygon[-1]])
+        if len(polygon) != len(group) + (len(groups) == 2):
+            return None
+        if len(groups) == 2:
+            # The centre must lie on the crease, between its neighbours
+            p, q = points[polygon[0]], points[polygon[-1]]
+            along = (points[centre] - q) @ (p - q) / ((p - q) @ (p - q))
+            if not 0 < along < 1 or np.linalg.norm(q + along * (p - q) - points[centre]) > tolerance:
+                return None
+            if len(polygon) == 2:
+                continue
+        triangles = ear_clip(points, polygon, n)
+        if triangles is None:
+            return None
+        result += triangles
+    return result
+
+def compact_triangles(triangles, tolerance=1e-4):
+    """Post-process a mesh for export, returning an (M, 3, 3) array: weld its
+    vertices, drop degenerate and duplicate triangles, then remove each
+    vertex inside a flat region or along a straight crease between two, and
+    fill the hole it leaves with as few triangles as possible. Moves the
+    surface by no more than tolerance (mm)."""
+    vertices, indices = weld_vertices(triangles)
+    if len(indices) == 0:
+        return vertices[indices]
+    points = vertices.astype(float)
+    # Rotate each triangle to start at its lowest index to find duplicates
+    first = np.argmin(indices, axis=1)[:, None]
+    indices = np.unique(np.take_along_axis(indices, (first + np.arange(3)) % 3, axis=1), axis=0)
+
+    # Only vertices where the triangles meeting have at most two normals
+    # (roughly, so as not to miss any) can go: compare each triangle with
+    # one of those at each of its corners, and those which differ with one
+    # of them. Slivers thinner than tolerance could lie in either plane, so
+    # are left to refill_fan(). Removing a vertex can let its neighbours go
+    # too, so they are always checked again.
+    sides = points[indices[:, [1, 2, 0]]] - points[indices]
+    normals = np.cross(sides[:, 0], sides[:, 1])
+    areas = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(areas, 1e-300)[:, None]
+    sliver = areas <= 2 * tolerance * np.sqrt(np.max(np.einsum("ijk,ijk->ij", sides, sides), axis=1))
+    corner_vertices = indices[~sliver].ravel()
+    corner_normals = np.repeat(normals[~sliver], 3, axis=0)
+    reference = np.zeros_like(points)
+    reference[corner_vertices] = corner_normals
+    differs = np.einsum("ij,ij->i", corner_normals, reference[corner_vertices]) < 0.9999
+    reference[corner_vertices[differs]] = corner_normals[differs]
+    differs &= np.einsum("ij,ij->i", corner_normals, reference[corner_vertices]) < 0.9999
+    candidates = np.setdiff1d(np.arange(len(points)), corner_vertices[differs])
+
+    faces = dict(enumerate(map(tuple, indices.tolist())))
+    incident = collections.defaultdict(set)
+    for i, face in faces.items():
+        for v in face:
+            incident[v].add(i)
+    next_face = len(faces)
+    pending = collections.deque(candidates.tolist())
+    while pending:
+        v = pending.popleft()
+        if not incident.get(v):
+            continue
+        edges = []
+        for i in incident[v]:
+            a, b, c = faces[i]
+            edges.append((b, c) if v == a else (c, a) if v == b else (a, b))
+        replacement = refill_fan(points, v, edges, tolerance)
+        if replacement is None:
+            continue
+        for i in incident.pop(v):
+            for u in faces.pop(i):
+                if u != v:
+                    incident[u].discard(i)
+                    pending.append(u)
+        for face in replacement:
+            faces[next_face] = face
+            for u in face:
+                incident[u].add(next_face)
+            next_face += 1
+    return vertices[np.array(list(faces.values()), dtype=np.int64).reshape(-1, 3)]
+
+def threemf_object(object_id, name, triangles):
+    # 3MF wants an indexed mesh
+    vertices, indices = weld_vertices(triangles)
+    return "".join([
+        f'<object id="{object_id}" name="{name}" type="model"><mesh><vertices>\n',
+        *(f'<vertex x="{x}" y="{y}" z="{z}"/>\n' for x, y, z in vertices.tolist()),
+        "</vertices><triangles>\n",
+        *(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>\n' for a, b, c in indices.tolist()),
+        "</triangles></mesh></object>\n",
+    ])
+
+def write_3mf(objects, fname):
+    """Write a dict of name to (N, 3, 3) triangle array as a 3MF file, with
+    one object per entry."""
+    model = "".join([
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<model unit="millimeter" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n',
+        "<resources>\n",
+        *(threemf_object(i + 1, name, triangles) for i, (name, triangles) in enumerate(objects.items())),
+        "</resources>\n<build>\n",
+        *(f'<item objectid="{i + 1}"/>\n' for i in range(len(objects))),
+        "</build>\n</model>\n",
+    ])
+    with zipfile.ZipFile(fname, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", threemf_content_types)
+        z.writestr("_rels/.rels", threemf_rels)
+        z.writestr("3D/3dmodel.model", model)
+
+# Seconds spent in each phase of building and exporting parts, the number of
+# triangles written, and booleans avoided by resolve_shapes(), for reporting
+phase_times = collections.Counter()
+
+# Workaround issue with fstl reading the file mid-rewrite: every file is
+# written to a temporary name and then renamed into place.
+def temp_name(fname):
+    """A name to write fname under before os.replace()ing it into place,
+    unique to this process, so that builds running at once (forked part
+    workers, daemon workers) into the same directory don't collide."""
+    return f"{fname}.{os.getpid()}.tmp"
+
+def safe_export(obj, fname, formats=None, mesh=None, tolerance=0.1, angular_tolerance=0.1, relative=True, compact=False):
+    """Export obj to fname, and to fname with its extension replaced by each
+    of formats ("stl", "3mf" or "step") if given. The shape is tessellated
+    once, with mesh_shape(), and the binary STL and 3MF are written from that
+    same triangulation. If mesh (e.g. a BoxMesh) is given, its triangles (or
+    boxes, for STEP) are written alongside obj. With compact, the triangles
+    are passed through compact_triangles() before writing the STL and 3MF.
+    Returns the triangles as an (N, 3, 3) array."""
+    base, ext = os.path.splitext(fname)
+    formats = [f.lower() for f in (formats or [ext[1:]])]
+    unknown = set(formats) - {"stl", "3mf", "step"}
+    if unknown:
+        raise ValueError(f"Unknown export formats {', '.join(sorted(unknown))}")
+    start = time.perf_counter()
+    stl = temp_name(base + ".stl")
+    shape = mesh_shape(obj, tolerance, angular_tolerance, relative)
+    triangles = snap_vertices(triangulation(shape))
+    meshed = time.perf_counter()
+    if mesh is not None:
+        triangles = np.concatenate([triangles, mesh.triangles()])
+    if compact:
+        triangles = compact_triangles(triangles)
+    if "stl" in formats:
+        write_stl_triangles(triangles, stl)
+    for fmt in formats:
+        tmp = stl if fmt == "stl" else temp_name(f"{base}.{fmt}")
+        if fmt == "3mf":
+            write_3mf({os.path.basename(base): triangles}, tmp)
+        elif fmt == "step":
+            if mesh is not None:
+                shape = cq.Compound.makeCompound([shape, *mesh.to_workplane()])
+            shape.exportStep(tmp)
+        os.replace(tmp, f"{base}.{fmt}")
+    if os.path.exists(stl):
+        os.remove(stl)
+    phase_times["tessellate"] += meshed - start
+    phase_times["export"] += time.perf_counter() - meshed
+    phase_times["triangles"] += len(triangles)
+    return triangles
+
+def safe_write_stl(obj, fname, **kwargs):
+    """Write obj to fname as STL, replacing any previous file atomically, and
+    return the number of triangles written. kwargs (tolerance, mesh, etc.)
+    are passed to safe_export()."""
+    return len(safe_export(obj, fname, ["stl"], **kwargs))
+
+Part = collections.namedtuple("Part", "func fname default requires export_options")
+
+registered_parts = {}
+
+# Results of build_part(), kept for the rest of the process. Registering a
+# part again, e.g. when watch.py reruns a script, forgets its result.
+built_parts = {}
+
+# Sub-features shared by every variant of a sweep(), by part name
+shared_features = {}
+
+# Part names which build_parts() builds when not given names, e.g. set by
+# scripts/cqcad to rebuild only some of a script's parts. None for the
+# default parts.
+selected_parts = None
+
+def part_name(fname):
+    return os.path.splitext(os.path.basename(fname))[0]
+
+def part(fname, default=True, requires=(), **export_options):
+    """Decorator registering a function which returns an output part, to be
+    built and exported to fname by build_parts(). The part is named after
+    fname, without its extension. The function may return a Workplane, or a
+    (Workplane, mesh) tuple for safe_export(), which is also passed any
+    formats, tolerance, angular_tolerance, relative or compact
+    keyword arguments.
+    Parts which aren't default (e.g. slow ones) are only built when asked
+    for by name. requires names other parts to build first, whose Workplanes
+    are passed to the function in that order."""
+    def register(func):
+        name = part_name(fname)
+        registered_parts[name] = Part(func, fname, default, tuple(requires), export_options)
+        built_parts.pop(name, None)
+        return func
+    return register
+
+def sweep(fname, func, grid, **export_options):
+    """Register a part for every combination of a grid of parameter values
+    (a dict of name to list of values), built by calling func with them as
+    keyword arguments and exported to fname formatted with them, e.g.
+    sweep("window_clamp_{l4}.stl", clamp, {"l4": [17, 43]}). Returns the part
+    names. Sub-features which func reaches through feature_cache and which
+    take no arguments cannot vary across the grid, so build_parts() builds
+    them once, before forking workers for the variants."""
+    shared = [f for f in cached_dependencies(func, set()) if not inspect.signature(f).parameters]
+    names = []
+    for values in itertools.product(*grid.values()):
+        kwargs = dict(zip(grid, values))
+        variant_fname = fname.format(**kwargs)
+        part(variant_fname, **export_options)(functools.partial(func, **kwargs))
+        names.append(part_name(variant_fname))
+        shared_features[names[-1]] = shared
+    return names
+
+def cached_dependencies(func, visited):
+    """feature_cache (or other BrepCache) wrapped functions reachable from
+    func through the globals it reads."""
+    func = getattr(func, "__wrapped__", func)
+    if func in visited:
+        return []
+    visited.add(func)
+    found = []
+    for name in sorted(global_names(func.__code__)):
+        value = func.__globals__.get(name)
+        if isinstance(getattr(value, "__wrapped__", value), types.FunctionType):
+            if isinstance(getattr(value, "cache", None), BrepCache) and value.cache.enabled:
+                found.append(value)
+            found += cached_dependencies(value, visited)
+    return found
+
+def build_part(name):
+    """Build and export one registered part, after the parts it requires,
+    returning it along with the time spent in each phase and its triangles.
+    Each part is only built once per process."""
+    if name not in built_parts:
+        p = registered_parts[name]
+        inputs = [build_part(required)[0] for required in p.requires]
+        before = phase_times.copy()
+        start = time.perf_counter()
+        result = p.func(*inputs)
+        obj, mesh = result if isinstance(result, tuple) else (result, None)
+        phase_times["build"] += time.perf_counter() - start
+        triangles = safe_export(obj, p.fname, mesh=mesh, **p.export_options)
+        built_parts[name] = obj, phase_times - before, triangles
+    return built_parts[name]
+
+def build_part_brep(name):
+    obj, times, triangles = build_part(name)
+    return to_brep(obj), times, triangles
+
+def required_parts(names):
+    """Every part required, directly or not, by the named parts."""
+    found = {}
+    def visit(name):
+        for required in registered_parts[name].requires:
+            if required not in found:
+                found[required] = True
+                visit(required)
+    for name in names:
+        visit(name)
+    return list(found)
+
+class Parts(dict):
+    """Parts returned by build_parts(). Any other registered part is built
+    (and exported) when first looked up."""
+    def __missing__(self, name):
+        self[name] = build_part(name)[0]
+        return self[name]
+
+def build_parts(names=None, parallel=True, combined_3mf=None):
+    """Build and export registered parts (the default ones, or the
+    selected_parts, unless given names), returning a Parts dict of name to
+    Workplane. Unless parallel is False the parts are built in a pool of
+    forked processes, one per core, and passed back as BREP. If combined_3mf
+    is given, the parts are also written there as one multi-object 3MF,
+    reusing the triangles from their export, though not when only selected
+    parts are built. Parts which others require, and sub-features shared by
+    the variants of a sweep(), are built first, so the workers inherit them
+    rather than each rebuilding them."""
+    if names is None:
+        if selected_parts is None:
+            names = [name for name, p in registered_parts.items() if p.default]
+        else:
+            names = [name for name in registered_parts if name in selected_parts]
+            combined_3mf = None
+    else:
+        names = list(names)
+    if not names:
+        return Parts()
+    start = time.perf_counter()
+    for name in required_parts(names):
+        build_part(name)
+    pending = [name for name in names if name not in built_parts]
+    workers = min(len(pending), os.cpu_count() or 1)
+    shared = list(dict.fromkeys(f for name in pending for f in shared_features.get(name, [])))
+    for func in shared:
+        func()
+    if shared:
+        print(f"{len(shared)} shared sub-features in {time.perf_counter() - start:.2f} s")
+    if parallel and workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # Workers are forked, so they inherit registered_parts and only need
+        # to be sent the part names.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            for name, (brep, times, triangles) in zip(pending, pool.map(build_part_brep, pending)):
+                built_parts[name] = from_brep(brep), times, triangles
+                phase_times.update(times)
+    else:
+        workers = 1
+        for name in pending:
+            build_part(name)
+    built = Parts()
+    for name in names:
+        obj, times, _ = built_parts[name]
+        print(
+            f"{name:<24} build {times['build']:7.2f} s   tessellate {times['tessellate']:6.2f} s"
+            f"   export {times['export']:6.2f} s   {times['triangles']:8d} triangles"
+            + (f"   {times['booleans saved']} booleans saved" if times["booleans saved"] else "")
+        )
+        built[name] = obj
+    if combined_3mf is not None:
+        tmp = temp_name(combined_3mf)
+        write_3mf({name: built_parts[name][2] for name in names}, tmp)
+        os.replace(tmp, combined_3mf)
+    print(f"{len(names)} parts in {time.perf_counter() - start:.2f} s with {workers} worker{'s' * (workers > 1)}")
+    return built
 
 def thread_profile(pitch, crest, od, od_flat_fraction, id_flat_fraction):
     r0 = od / 2 + crest * 0.01
@@ -86,21 +1348,36 @@ def thread_profile(pitch, crest, od, od_flat_fraction, id_flat_fraction):
         (r0, 0, z3),
     ]
 
-def extruded_thread(pitch, crest, od, length, lefthanded=False, od_flat_fraction=0.2, id_flat_fraction=0.2):
+def extruded_thread(pitch, crest, od, length, lefthanded=False, od_flat_fraction=0.2, id_flat_fraction=0.2, **options):
+    """Feature of a thread swept along a helix. options are boolean options
+    (see boolean_options) for the booleans it takes part in, e.g. a fuzzy
+    value for where its ends meet other faces."""
     turns = (length - pitch) / pitch
     assert(turns > 0)
-    # twistExtrude behaves strangely for large angles, so extrude one turn at a
-    # time and take a union.
-    accum = cq.Workplane("XY")
+    # Sweep the whole thread along a helix in one operation. The helix is
+    # made of one edge per turn, as faces which wrap more than once around
+    # the axis make later booleans silently fail. The profile is centred on
+    # the start of the helix: half a pitch up it is equidistant from the first
+    # two turns, and OCC may attach it to the wrong one.
+    profile = [
+        (r, y, z - pitch / 2)
+        for r, y, z in thread_profile(pitch, crest, od, od_flat_fraction, id_flat_fraction)
+    ]
+    edges = []
     offset = 0
     while turns > 0:
         chunk = 1 if turns > 1 else turns
         turns -= chunk
-        accum = accum.union(
-            cq.Workplane("XY")
-            .workplane(offset=offset)
-            .polyline(thread_profile(pitch, crest, od, od_flat_fraction, id_flat_fraction)).close()
-            .twistExtrude(pitch * chunk, (-360 if lefthanded else 360) * chunk)
+        edges.extend(
+            cq.Wire.makeHelix(pitch, pitch * chunk, od / 2, center=cq.Vector(0, 0, offset), lefthand=lefthanded)
+            .Edges()
         )
         offset += pitch
-    return Feature(accum)         
+    helix = cq.Wire.assembleEdges(edges)
+    return Feature(
+        cq.Workplane("XY")
+        .polyline(profile).close()
+        .sweep(cq.Workplane("XY").add(helix), isFrenet=True)
+        .translate((0, 0, pitch / 2)),
+        **options
+    )
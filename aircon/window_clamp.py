@@ -1,6 +1,6 @@
 import cadquery as cq
 import math
-from util import safe_write_stl
+from util import part, sweep, build_parts, feature_cache
 
 l1                 = 25 # Back-side X
 l2                 = 6  # Y
@@ -13,6 +13,7 @@ seal_step          = 3.5
 seal_step_from_end = 9
 
 thickness          = 2 # Set to 4x extrusion line width
+layer_height       = 0.2
 
 height             = 30
 
@@ -53,6 +54,7 @@ def c_clip(l4):
 		.faces("<Y or >Y").chamfer(thickness * 0.125)
 	).translate((thickness / 2, 0, 0))
 
+@feature_cache
 def screw_block():
 	return (
 		cq.Workplane("XY")
@@ -63,6 +65,7 @@ def screw_block():
 		.faces("<Y or >Y").chamfer(thickness * 0.125)
 	)
 
+@feature_cache
 def clip_screw_hole():
 	return (
 		cq.Workplane("XZ")
@@ -77,10 +80,13 @@ def clip_screw_hole():
 		.extrude(-0.3, taper=45)
 	)
 
-for i, l4 in enumerate(l4_options):
-	result = c_clip(l4).union(screw_block()) - clip_screw_hole()
-	if "show_object" in globals(): show_object(result.translate((0, 0, i * height * 1.5)))
-	safe_write_stl(result, f"window_clamp_{l4}.stl")
+def clamp(l4):
+	return c_clip(l4).union(screw_block()) - clip_screw_hole()
+
+# Mesh to a chord error of a quarter of a layer (see mesh_shape())
+mesh_options = dict(tolerance=layer_height / 4, relative=False, angular_tolerance=0.5)
+
+sweep("window_clamp_{l4}.stl", clamp, {"l4": l4_options}, **mesh_options)
 
 def clamp_plate():
 	return (
@@ -97,6 +103,13 @@ def clamp_plate():
 		.circle(screw_cb_diameter / 2).cutBlind(-screw_cb_depth)
 	)
 
-plate = clamp_plate()
-if "show_object" in globals(): show_object(plate.translate((0, -50, 0)))
-safe_write_stl(plate.rotate((0, 0, 0), (1, 0, 0), -90), "window_clamp_plate.stl")
+@part("window_clamp_plate.stl", **mesh_options)
+def window_clamp_plate():
+	return clamp_plate().rotate((0, 0, 0), (1, 0, 0), -90)
+
+parts = build_parts(parallel="show_object" not in globals())
+
+if "show_object" in globals():
+	for i, l4 in enumerate(l4_options):
+		show_object(parts[f"window_clamp_{l4}"].translate((0, 0, i * height * 1.5)))
+	show_object(parts["window_clamp_plate"].rotate((0, 0, 0), (1, 0, 0), 90).translate((0, -50, 0)))
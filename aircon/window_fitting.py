@@ -38,8 +38,24 @@ hose_pitch_lh = 10
 hose_pitch_rh = 8
 hose_crest = 5
 
+layer_height = 0.2
+
+# Mesh to a chord error of a quarter of a layer (see mesh_shape())
+mesh_options = dict(tolerance=layer_height / 4, relative=False, angular_tolerance=0.5)
+
 collar_wall_thickness = 6
 
+def grip_grooves():
+    return pattern(
+        Feature(
+            cq.Workplane("XY")
+            .workplane(offset=-1)
+            .circle(grip_groove_radius)
+            .extrude(fitting_flange_thickness + 2)
+        ).invert(),
+        polar_locations(fitting_flange_width + plate_hole_diameter / 2 + grip_groove_radius - grip_groove_depth, grip_groove_count)
+    )
+
 def fitting_inner_base():
     return Feature(
         (
@@ -55,10 +71,7 @@ def fitting_inner_base():
         .cutThruAll()
         .faces("<Z").chamfer(fitting_face_chamfer)
         .faces(">Z").chamfer(fitting_fit_chamfer)
-        .polarArray(fitting_flange_width + plate_hole_diameter / 2 + grip_groove_radius - grip_groove_depth, 0, 360, grip_groove_count)
-        .circle(grip_groove_radius)
-        .cutThruAll()
-    )
+    ).combine(grip_grooves())
 
 def fitting_outer_base():
     return Feature(
@@ -69,39 +82,42 @@ def fitting_outer_base():
         .faces(">Z").chamfer(fitting_fit_chamfer)
         .circle(plate_hole_diameter / 2 + fitting_thread_clearance)
         .cutThruAll()
-        .polarArray(fitting_flange_width + plate_hole_diameter / 2 + grip_groove_radius - grip_groove_depth, 0, 360, grip_groove_count)
-        .circle(grip_groove_radius)
-        .cutThruAll()
-    )
+    ).combine(grip_grooves())
 
 def magnet_holes():
-    return Feature(
-        cq.Workplane("XY")
-        .polarArray(magnet_ring_diameter / 2, 0, 360, magnet_count)
-        .circle(magnet_diameter / 2)
-        .extrude(magnet_depth)
-    ).invert()
-
-fitting_inner = resolve_features(
-    fitting_inner_base(),
-    extruded_thread(
-        fitting_thread_pitch,
-        fitting_thread_crest,
-        plate_hole_diameter,
-        plate_thickness + fitting_flange_thickness + fitting_thread_pitch
-    ).translateZ(fitting_flange_thickness).invert(),
-    magnet_holes()
-)
-
-fitting_outer = resolve_features(
-    fitting_outer_base(),
-    extruded_thread(
-        fitting_thread_pitch,
-        fitting_thread_crest,
-        plate_hole_diameter + 2 * fitting_thread_clearance,
-        fitting_flange_thickness 
+    return pattern(
+        Feature(
+            cq.Workplane("XY")
+            .circle(magnet_diameter / 2)
+            .extrude(magnet_depth)
+        ).invert(),
+        polar_locations(magnet_ring_diameter / 2, magnet_count)
+    )
+
+@part("window_fitting_inner.stl", **mesh_options)
+def window_fitting_inner():
+    return resolve_features(
+        fitting_inner_base(),
+        extruded_thread(
+            fitting_thread_pitch,
+            fitting_thread_crest,
+            plate_hole_diameter,
+            plate_thickness + fitting_flange_thickness + fitting_thread_pitch
+        ).translateZ(fitting_flange_thickness).invert(),
+        magnet_holes()
+    )
+
+@part("window_fitting_outer.stl", **mesh_options)
+def window_fitting_outer():
+    return resolve_features(
+        fitting_outer_base(),
+        extruded_thread(
+            fitting_thread_pitch,
+            fitting_thread_crest,
+            plate_hole_diameter + 2 * fitting_thread_clearance,
+            fitting_flange_thickness 
+        )
     )
-)
 
 def antichamfer_cutout():
     return Feature(
@@ -162,20 +178,23 @@ def fitting_cover():
         antichamfer_cutout()
     )
 
-safe_write_stl(fitting_inner, "window_fitting_inner.stl")
-safe_write_stl(fitting_outer, "window_fitting_outer.stl")
+@part("window_collar_intake.stl", **mesh_options)
+def window_collar_intake():
+    return threaded_collar(10, True)
+
+@part("window_collar_exhaust.stl", **mesh_options)
+def window_collar_exhaust():
+    return threaded_collar(8, False)
 
-collar_intake = threaded_collar(10, True)
-collar_exhaust = threaded_collar(8, False)
-collar_blocked = fitting_cover()
+@part("window_collar_blocked.stl", **mesh_options)
+def window_collar_blocked():
+    return fitting_cover()
 
-safe_write_stl(collar_intake, "window_collar_intake.stl")
-safe_write_stl(collar_exhaust, "window_collar_exhaust.stl")
-safe_write_stl(collar_blocked, "window_collar_blocked.stl")
+parts = build_parts(parallel="show_object" not in globals(), combined_3mf="window_fitting.3mf")
 
 if "show_object" in globals():
-    show_object(fitting_inner, options={"color": "red"})
-    show_object(fitting_outer.rotate((0, 0, 0), (1, 0, 0), 180).translate((0, 0, 100)), options={"color": "blue"})
-    show_object(collar_intake.translate((0, 0, -100)))
-    show_object(collar_exhaust.translate((0, 0, -200)))
-    show_object(collar_blocked.translate((0, 0, -300)))
+    show_object(parts["window_fitting_inner"], options={"color": "red"})
+    show_object(parts["window_fitting_outer"].rotate((0, 0, 0), (1, 0, 0), 180).translate((0, 0, 100)), options={"color": "blue"})
+    show_object(parts["window_collar_intake"].translate((0, 0, -100)))
+    show_object(parts["window_collar_exhaust"].translate((0, 0, -200)))
+    show_object(parts["window_collar_blocked"].translate((0, 0, -300)))
@@ -0,0 +1,225 @@
+# Benchmark every model script in the repo, headless and with util's
+# feature_cache disabled, recording for each part (or exported file, for
+# scripts which don't use util.part) the time spent constructing geometry,
+# in booleans, tessellating and exporting, with its triangle count and the
+# peak RSS so far. Each script runs in its own process, in a temporary
+# directory so no outputs land in the tree. Results are appended to a JSON
+# history (by default bench/history.json, which is local to each checkout
+# and ignored by git) and compared against the previous run.
+# hot_intake_plate.py, with its filter, is the headline stress case and runs
+# first.
+#
+# Usage: python3 bench/bench_all.py [script.py ...] [--history FILE] [--no-save]
+
+import argparse
+import builtins
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+headline = os.path.join("aircon", "hot_intake_plate.py")
+
+def all_scripts():
+    scripts = [
+        os.path.relpath(f, repo_dir)
+        for d in ("aircon", "qfn_box", "random", "boox-page-stand")
+        for f in sorted(glob.glob(os.path.join(repo_dir, d, "*.py")))
+        if os.path.basename(f) != "util.py"
+    ]
+    scripts.remove(headline)
+    return [headline] + scripts
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_child(script, out):
+    """Run one script in this process, instrumented, and write its per-part
+    results to out as JSON."""
+    import cadquery as cq
+    from OCP.BRep import BRep_Tool
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    from OCP.TopLoc import TopLoc_Location
+
+    script = os.path.join(repo_dir, script)
+    script_dir = os.path.dirname(script)
+    sys.path.insert(0, script_dir)
+    builtins.show_object = lambda *args, **kwargs: None
+    parts = []
+    counters = {"booleans": 0.0}
+
+    # Time spent in booleans, wherever they are called from. Compound
+    # overrides some of Shape's methods, so guard against counting twice.
+    depth = [0]
+    def timed_boolean(method):
+        def wrapper(*args, **kwargs):
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                if depth[0] == 0:
+                    counters["booleans"] += time.perf_counter() - start
+        return wrapper
+    for cls in (cq.Shape, cq.Compound, cq.Solid):
+        for name in ("fuse", "cut", "intersect", "split"):
+            if name in cls.__dict__:
+                setattr(cls, name, timed_boolean(cls.__dict__[name]))
+
+    if os.path.exists(os.path.join(script_dir, "util.py")):
+        import util
+        util.feature_cache.enabled = False
+        util.boolean = timed_boolean(util.boolean)
+        build_parts = util.build_parts
+        # Every part, including those only built on request, in this process
+        util.build_parts = lambda names=None, parallel=True, **kwargs: build_parts(
+            list(util.registered_parts) if names is None else names, False, **kwargs
+        )
+        build_part = util.build_part
+        def measured_build_part(name):
+            booleans = counters["booleans"]
+            result = build_part(name)
+            times = result[1]
+            booleans = counters["booleans"] - booleans
+            parts.append({
+                "part": name,
+                "construct": times["build"] - booleans,
+                "booleans": booleans,
+                "tessellate": times["tessellate"],
+                "export": times["export"],
+                "triangles": times["triangles"],
+                "peak_rss_mb": peak_rss_mb(),
+            })
+            return result
+        util.build_part = measured_build_part
+    else:
+        # Plain scripts: each exported file is a part, constructed since the
+        # previous export
+        export = cq.exporters.export
+        mark = [time.perf_counter()]
+        def measured_export(w, fname, exportType=None, tolerance=0.1, angularTolerance=0.1, *args, **kwargs):
+            start = time.perf_counter()
+            shape = w if isinstance(w, cq.Shape) else cq.Compound.makeCompound(list(w))
+            triangles = 0
+            if (exportType or os.path.splitext(fname)[1][1:]).upper() == "STL":
+                # Same meshing as exportStl, which then finds it already done
+                BRepMesh_IncrementalMesh(shape.wrapped, tolerance, True, angularTolerance, True)
+                loc = TopLoc_Location()
+                for f in shape.Faces():
+                    poly = BRep_Tool.Triangulation_s(f.wrapped, loc)
+                    triangles += poly.NbTriangles() if poly is not None else 0
+            meshed = time.perf_counter()
+            export(shape, fname, exportType, tolerance, angularTolerance, *args, **kwargs)
+            end = time.perf_counter()
+            parts.append({
+                "part": os.path.splitext(os.path.basename(fname))[0],
+                "construct": start - mark[0] - counters["booleans"],
+                "booleans": counters["booleans"],
+                "tessellate": meshed - start,
+                "export": end - meshed,
+                "triangles": triangles,
+                "peak_rss_mb": peak_rss_mb(),
+            })
+            counters["booleans"] = 0.0
+            mark[0] = time.perf_counter()
+        cq.exporters.export = measured_export
+
+    import runpy
+    start = time.perf_counter()
+    runpy.run_path(script, run_name="__main__")
+    with open(out, "w") as f:
+        json.dump({"total": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb(), "parts": parts}, f)
+
+def run(script):
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "result.json")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", script, out],
+            cwd=tmp, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+        with open(out) as f:
+            return json.load(f)
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=repo_dir, capture_output=True, text=True).stdout.strip()
+    commit = git("rev-parse", "--short", "HEAD")
+    return commit + ("-dirty" if git("status", "--porcelain", "--untracked-files=no") else "")
+
+def previous_parts(history):
+    """Most recent time for each (script, part) in the history."""
+    previous = {}
+    for entry in history:
+        for script, result in entry["results"].items():
+            for p in result.get("parts", []):
+                previous[script, p["part"]] = part_time(p), entry["commit"]
+    return previous
+
+def part_time(p):
+    return p["construct"] + p["booleans"] + p["tessellate"] + p["export"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every model script")
+    parser.add_argument("scripts", nargs="*", help="scripts relative to the repo root (default: all)")
+    parser.add_argument("--history", default=os.path.join(repo_dir, "bench", "history.json"))
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the history")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history) as f:
+            history = json.load(f)
+    previous = previous_parts(history)
+
+    import cadquery as cq
+    entry = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "cadquery": cq.__version__,
+        "results": {},
+    }
+    print(
+        f"{'part':<32} {'construct':>9} {'booleans':>9} {'tessellate':>10} {'export':>7}"
+        f" {'triangles':>9} {'RSS MB':>7} {'vs previous':>18}"
+    )
+    for script in args.scripts or all_scripts():
+        result = entry["results"][script] = run(script)
+        if "error" in result:
+            print(f"{script}: FAILED: {result['error']}")
+            continue
+        print(f"{script}: {result['total']:.2f} s, peak RSS {result['peak_rss_mb']:.0f} MB")
+        for p in result["parts"]:
+            change = ""
+            if (script, p["part"]) in previous:
+                before, commit = previous[script, p["part"]]
+                change = f"{(part_time(p) / before - 1) * 100:+6.1f}% ({commit})" if before > 0 else ""
+            print(
+                f"  {p['part']:<30} {p['construct']:9.2f} {p['booleans']:9.2f} {p['tessellate']:10.2f}"
+                f" {p['export']:7.2f} {p['triangles']:9d} {p['peak_rss_mb']:7.0f} {change:>18}"
+            )
+
+    if headline in entry["results"] and "total" in entry["results"][headline]:
+        result = entry["results"][headline]
+        print(f"\nHeadline {headline}: {result['total']:.2f} s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    if not args.no_save:
+        history.append(entry)
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# Time the ways of slicing the bottom of boox-page-stand/stand.py flat, as the
+# final step of the stand: cutting the boox blank and then the 1000 x 1000 mm
+# floor box one after the other (as it did), cutting both in one boolean (as
+# it does now), CadQuery's split(keepTop=True), and util's clip() half-space
+# resolved along with the blank, both as Features.
+#
+# Usage: python3 bench/bench_clip.py
+
+import builtins
+import os
+import runpy
+import sys
+import time
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(repo_dir, "aircon"))
+
+import cadquery as cq
+from util import Feature, clip, resolve_features
+
+builtins.show_object = lambda *args, **kwargs: None
+cq.exporters.export = lambda *args, **kwargs: None
+ns = runpy.run_path(os.path.join(repo_dir, "boox-page-stand", "stand.py"))
+base, boox_blank, floor = ns["base"], ns["boox_blank"], ns["floor"]
+
+def timed(f, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+cases = [
+    ("cut blank, then floor box", lambda: base - boox_blank - floor),
+    ("one cut, blank + floor box", lambda: base - (boox_blank + floor)),
+    ("split(keepTop=True)", lambda: (base - boox_blank).copyWorkplane(cq.Workplane("XY")).split(keepTop=True)),
+    ("Features, floor box", lambda: resolve_features(Feature(base), Feature(None, floor), Feature(boox_blank).invert())),
+    ("Features, clip()", lambda: resolve_features(Feature(base), clip(), Feature(boox_blank).invert())),
+]
+print(f"{'method':<28} {'time (s)':>8} {'volume':>10} {'faces':>6}")
+for name, f in cases:
+    result, t = timed(f)
+    print(f"{name:<28} {t:8.3f} {result.val().Volume():10.1f} {len(result.val().Faces()):6d}")
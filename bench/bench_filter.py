@@ -0,0 +1,35 @@
+# Time the hot_intake_plate.py filter against filter_line_pitch, both as B-rep
+# (filter_plate) and with the lines written straight to triangles
+# (filter_frame + filter_lines, as used when filter_direct_mesh is set).
+#
+# Usage: python3 bench/bench_filter.py [pitch ...]
+
+import os
+import runpy
+import sys
+import time
+
+aircon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon")
+sys.path.insert(0, aircon_dir)
+
+import util
+
+util.safe_export = lambda obj, fname, *args, **kwargs: util.np.zeros((0, 3, 3))
+util.feature_cache.enabled = False
+
+ns = runpy.run_path(os.path.join(aircon_dir, "hot_intake_plate.py"), run_name="bench")
+params = ns["filter_plate"].__wrapped__.__globals__
+
+def timed(f):
+    t = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - t
+
+pitches = [float(p) for p in sys.argv[1:]] or [2.0, 1.5, 1.0, 0.75, 0.6, 0.4]
+print(f"{'pitch':>6} {'lines':>6} {'brep (s)':>9} {'frame (s)':>9} {'mesh (s)':>9} {'triangles':>9}")
+for pitch in pitches:
+    params["filter_line_pitch"] = pitch
+    brep, t_brep = timed(ns["filter_plate"])
+    frame, t_frame = timed(lambda: util.shape_triangles(ns["filter_frame"]()))
+    lines, t_mesh = timed(lambda: ns["filter_lines"]().triangles())
+    print(f"{pitch:6.2f} {len(lines) // 12:6d} {t_brep:9.3f} {t_frame:9.3f} {t_mesh:9.3f} {len(frame) + len(lines):9d}")
@@ -0,0 +1,46 @@
+# Compare folding features together one union at a time (Feature.combine)
+# against a single multi-argument fuse (combine_features) for every
+# resolve_features() call made by the aircon scripts.
+#
+# Usage: python3 bench/bench_fuse.py [script.py ...]
+
+import functools
+import os
+import runpy
+import sys
+import time
+
+aircon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon")
+sys.path.insert(0, aircon_dir)
+
+import util
+
+results = []
+
+def timed(f):
+    t = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - t
+
+def compare(*features):
+    folded, t_fold = timed(lambda: functools.reduce(util.Feature.combine, features).resolve())
+    fused, t_fuse = timed(lambda: util.combine_features(*features).resolve())
+    results.append((len(features), t_fold, t_fuse, folded.val().Volume(), fused.val().Volume()))
+    return fused
+
+# Patch before the scripts do `from util import *`
+util.resolve_features = compare
+util.safe_export = lambda obj, fname, *args, **kwargs: util.np.zeros((0, 3, 3))
+# Build in this process, so compare() sees every call, and don't write the
+# scripts' combined 3MFs (of empty meshes) into the working directory
+build_parts = util.build_parts
+util.build_parts = lambda names=None, parallel=True, **kwargs: build_parts(names, False)
+
+scripts = sys.argv[1:] or ["hot_intake_plate.py", "window_fitting.py"]
+for script in scripts:
+    start = len(results)
+    runpy.run_path(os.path.join(aircon_dir, script), run_name="bench")
+    print(f"{script}:")
+    print(f"  {'features':>8} {'fold (s)':>9} {'fuse (s)':>9} {'speedup':>8} {'vol diff':>9}")
+    for n, t_fold, t_fuse, v_fold, v_fuse in results[start:]:
+        print(f"  {n:8d} {t_fold:9.3f} {t_fuse:9.3f} {t_fold / t_fuse:7.2f}x {abs(v_fold - v_fuse):9.4f}")
@@ -0,0 +1,67 @@
+# Time cutting a repeated tool with pattern() (tool built once, located
+# copies, one boolean) against cutting each copy in turn, and against the
+# Workplane array idiom the scripts used (one tool built per array point,
+# then one cut), for the patterns used in window_fitting.py and a
+# qfn_box.py-style grid of pockets.
+#
+# Usage: python3 bench/bench_pattern.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon"))
+
+import cadquery as cq
+from util import Feature, pattern, polar_locations, grid_locations
+
+def timed(f):
+    t = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - t
+
+def ring():
+    return cq.Workplane("XY").circle(86).circle(70).extrude(8)
+
+def slab(size):
+    return cq.Workplane("XY").rect(size, size).extrude(2).translate((0, 0, -1))
+
+# (name, body, tool at the origin, locations, the same cut as a Workplane array)
+cases = [
+    (
+        "24 grip grooves", ring,
+        lambda: cq.Workplane("XY").workplane(offset=-1).circle(8).extrude(10),
+        polar_locations(93.2, 24),
+        lambda body: body.polarArray(93.2, 0, 360, 24).circle(8).cutThruAll(),
+    ),
+    (
+        "8 magnet holes", ring,
+        lambda: cq.Workplane("XY").workplane(offset=4.8).circle(3.3).extrude(3.2),
+        polar_locations(78, 8),
+        lambda body: body.faces(">Z").workplane().polarArray(78, 0, 360, 8).circle(3.3).cutBlind(-3.2),
+    ),
+]
+for n in (4, 10):
+    cases.append((
+        f"{n}x{n} pockets", lambda n=n: slab(n * 14 + 4),
+        lambda: cq.Workplane("XY").workplane(offset=1).rect(10.6, 10.6).extrude(-1),
+        grid_locations(14, 14, n, n),
+        lambda body, n=n: body.faces(">Z").workplane().rarray(14, 14, n, n).rect(10.6, 10.6).cutBlind(-1),
+    ))
+
+print(f"{'pattern':<16} {'per copy (s)':>12} {'array (s)':>10} {'pattern (s)':>11} {'vs per copy':>11} {'vs array':>9} {'vol diff':>9}")
+for name, body, tool, locations, array in cases:
+    def per_copy():
+        result = body()
+        shape = tool().val()
+        for loc in locations:
+            result = result.cut(shape.moved(loc))
+        return result
+    naive, t_naive = timed(per_copy)
+    arrayed, t_array = timed(lambda: array(body()))
+    patterned, t_pattern = timed(lambda: Feature(body()).combine(pattern(Feature(tool()).invert(), locations)).resolve())
+    volumes = [r.val().Volume() for r in (naive, arrayed, patterned)]
+    print(
+        f"{name:<16} {t_naive:12.3f} {t_array:10.3f} {t_pattern:11.3f} {t_naive / t_pattern:10.2f}x"
+        f" {t_array / t_pattern:8.2f}x {max(volumes) - min(volumes):9.4f}"
+    )
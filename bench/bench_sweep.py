@@ -0,0 +1,43 @@
+# Time building a family of window_clamp.py variants with sweep(), which
+# builds the l4-invariant screw_block and clip_screw_hole once, against
+# rebuilding every sub-feature for each variant (feature_cache disabled).
+# Both start from an empty cache directory.
+#
+# Usage: python3 bench/bench_sweep.py [variants]
+
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+aircon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon")
+sys.path.insert(0, aircon_dir)
+
+import util
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+util.safe_export = lambda obj, fname, *args, **kwargs: util.np.zeros((0, 3, 3))
+util.build_parts = lambda *args, **kwargs: {}
+ns = runpy.run_path(os.path.join(aircon_dir, "window_clamp.py"), run_name="bench")
+clamp = ns["clamp"]
+l4_options = [17 + i * 2 for i in range(count)]
+
+def build(cached):
+    util.registered_parts.clear()
+    util.shared_features.clear()
+    util.feature_cache.enabled = cached
+    util.feature_cache.memory.clear()
+    names = util.sweep("window_clamp_{l4}.stl", clamp, {"l4": l4_options})
+    start = time.perf_counter()
+    for func in dict.fromkeys(f for name in names for f in util.shared_features[name]):
+        func()
+    for name in names:
+        util.build_part(name)
+    return time.perf_counter() - start
+
+with tempfile.TemporaryDirectory() as cache_dir:
+    util.feature_cache.path = cache_dir
+    t_rebuild = build(False)
+    t_sweep = build(True)
+print(f"{count} variants: rebuild every sub-feature {t_rebuild:.2f} s, sweep {t_sweep:.2f} s ({t_rebuild / t_sweep:.2f}x)")
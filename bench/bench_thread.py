@@ -0,0 +1,85 @@
+# Compare the helical sweep thread (util.extruded_thread) against building
+# the thread one twistExtrude'd turn at a time (twist_extruded_thread, below,
+# which util used before) for the hose threads used in the aircon scripts.
+# Also times fusing each thread onto a collar, since seams between turns make
+# later booleans more expensive.
+#
+# Usage: python3 bench/bench_thread.py
+
+import functools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon"))
+
+import cadquery as cq
+from util import Feature, extruded_thread, thread_profile, to_workplane
+
+@functools.lru_cache(maxsize=64)
+def thread_turn(pitch, crest, od, lefthanded, od_flat_fraction, id_flat_fraction, fraction=1):
+    """One turn (or part of a turn) of twistExtrude'd thread, starting at Z = 0.
+    Memoised, since every turn of a thread is identical."""
+    return (
+        cq.Workplane("XY")
+        .polyline(thread_profile(pitch, crest, od, od_flat_fraction, id_flat_fraction)).close()
+        .twistExtrude(pitch * fraction, (-360 if lefthanded else 360) * fraction)
+        .val()
+    )
+
+def twist_extruded_thread(pitch, crest, od, length, lefthanded=False, od_flat_fraction=0.2, id_flat_fraction=0.2):
+    turns = (length - pitch) / pitch
+    assert(turns > 0)
+    # twistExtrude behaves strangely for large angles, so extrude one turn at a
+    # time. Each turn is a located copy of the same memoised solid, and turns
+    # meet exactly at their planar end caps, so rather than fusing the turns we
+    # drop the internal caps and sew the remaining faces into one solid.
+    instances = []
+    offset = 0
+    while turns > 0:
+        chunk = 1 if turns > 1 else turns
+        turns -= chunk
+        instances.append(
+            thread_turn(pitch, crest, od, lefthanded, od_flat_fraction, id_flat_fraction, chunk)
+            .moved(cq.Location(cq.Vector(0, 0, offset)))
+        )
+        offset += pitch
+    faces = []
+    for i, turn in enumerate(instances):
+        start_cap, end_cap = sorted(
+            (f for f in turn.Faces() if f.geomType() == "PLANE"),
+            key=lambda f: f.Center().z
+        )
+        faces.extend(f for f in turn.Faces() if f.geomType() != "PLANE")
+        if i == 0:
+            faces.append(start_cap)
+        if i == len(instances) - 1:
+            faces.append(end_cap)
+    return Feature(cq.Workplane("XY").newObject([cq.Solid.makeSolid(cq.Shell.makeShell(faces)).clean()]))
+
+# (name, pitch, crest, od, length, lefthanded, od_flat_fraction, id_flat_fraction)
+threads = [
+    ("hot_intake_plate fitting", 10, 5, 150, 27.5, True, 0.16, 0.1),
+    ("window_fitting collar LH", 10, 5, 150, 30, True, 0.16, 0.1),
+    ("window_fitting collar RH", 8, 5, 150, 24, False, 0.16, 0.1),
+    ("window_fitting inner", 3.2, 1.6, 148, 15.2, False, 0.2, 0.2),
+    ("window_fitting outer", 3.2, 1.6, 149.6, 8, False, 0.2, 0.2),
+]
+
+def timed(f):
+    t = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - t
+
+print(f"{'thread':<26} {'engine':<6} {'build (s)':>9} {'fuse (s)':>9} {'faces':>6} {'volume':>10} {'fused vol':>10}")
+for name, pitch, crest, od, length, lh, odf, idf in threads:
+    collar = (
+        cq.Workplane("XY")
+        .circle(od / 2 + 2 * crest)
+        .circle(od / 2 - crest / 2)
+        .extrude(length)
+    )
+    for engine, f in (("twist", twist_extruded_thread), ("sweep", extruded_thread)):
+        thread, t_build = timed(lambda: to_workplane(f(pitch, crest, od, length, lh, odf, idf).positive))
+        fused, t_fuse = timed(lambda: collar.union(thread))
+        print(f"{name:<26} {engine:<6} {t_build:9.3f} {t_fuse:9.3f} {len(thread.faces().vals()):6d} {thread.val().Volume():10.1f} {fused.val().Volume():10.1f}")
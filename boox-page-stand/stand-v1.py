@@ -56,6 +56,7 @@ boox_blank = (
 
 result = base - boox_blank
 
-show_object(result)
-# show_object(boox_blank)
+if "show_object" in globals():
+	show_object(result)
+	# show_object(boox_blank)
 cq.exporters.export(result, "stand.stl")
@@ -74,9 +74,11 @@ floor = (
 )
 
 base = base | columns
-result = base - boox_blank - floor
+# One cut for both, rather than a second pass over the whole stand
+result = base - (boox_blank + floor)
 
-show_object(result)
-# show_object(columns, options={"color": "red"})
-# show_object(boox_blank)
+if "show_object" in globals():
+	show_object(result)
+	# show_object(columns, options={"color": "red"})
+	# show_object(boox_blank)
 cq.exporters.export(result, "stand.stl")
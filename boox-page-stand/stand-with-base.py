@@ -97,8 +97,8 @@ base_cutouts = (
 	.chamfer(base_cutout_width * 0.499)
 )
 
-base = (base | columns) - base_cutouts
-bracket = base - boox_blank - floor
+# One cut for all of them, rather than a pass over the whole stand for each
+bracket = (base | columns) - (base_cutouts + boox_blank + floor)
 
 foot = (
 	cq.Workplane("front")
@@ -112,8 +112,9 @@ foot = (
 )
 result = bracket | foot
 
-show_object(result)
+if "show_object" in globals():
+	show_object(result)
 
-# show_object(columns, options={"color": "red"})
-# show_object(boox_blank)
+	# show_object(columns, options={"color": "red"})
+	# show_object(boox_blank)
 cq.exporters.export(result, "stand.stl")
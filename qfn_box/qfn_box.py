@@ -106,7 +106,8 @@ lid = (
     .extrude(package_lip_height)
 )
 
-show_object(base)
-show_object(lid)
+if "show_object" in globals():
+    show_object(base)
+    show_object(lid)
 cq.exporters.export(base, f"{package_size}mm_{cols}x{rows}_base.stl")
 cq.exporters.export(lid, f"{package_size}mm_{cols}x{rows}_lid.stl")
@@ -39,5 +39,6 @@ base = (
 	.text("AMTEST", 7, -0.5, font="noto sans mono", kind="bold")
 )
 
-show_object(base)
+if "show_object" in globals():
+	show_object(base)
 cq.exporters.export(base, "amy_card_boxy.stl")
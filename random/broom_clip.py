@@ -47,6 +47,7 @@ bracket = (
 )
 
 result = plate | bracket
-show_object(result)
+if "show_object" in globals():
+    show_object(result)
 
 cq.exporters.export(result, "broom_clip.stl")
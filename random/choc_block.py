@@ -103,8 +103,9 @@ base = (
     .cboreHole(base_hole_diameter, base_cbore_diameter, base_cbore_depth)
 )
 
-show_object(case)
-show_object(base)
+if "show_object" in globals():
+    show_object(case)
+    show_object(base)
 
 cq.exporters.export(case, f"choc_block_case_{cols}x{rows}.stl")
 cq.exporters.export(base, f"choc_block_base_{cols}x{rows}.stl")
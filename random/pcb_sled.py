@@ -48,5 +48,6 @@ result = (
     .transformed(offset=(0,25,0),rotate=(0,0,180)).text("AMMO BOARD", 7.5, -0.2)
 )
 
-show_object(result)
+if "show_object" in globals():
+    show_object(result)
 cq.exporters.export(result, f"pcb_sled_W{perimeter_w}_H{perimeter_h}.stl")
\ No newline at end of file
@@ -45,5 +45,6 @@ result = (
     .cutBlind(bottom_groove_depth)
 )
 
-show_object(result)
+if "show_object" in globals():
+    show_object(result)
 cq.exporters.export(result, "scrap_tray.stl")
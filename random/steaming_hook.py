@@ -39,6 +39,7 @@ result = (
     .cskHole(thread_diameter, csk_diameter, 90)
 ) - cone
 
-show_object(result)
+if "show_object" in globals():
+    show_object(result)
 
 cq.exporters.export(result, "steaming_hook.stl")
@@ -46,6 +46,7 @@ casing = (
 
 result = result - casing
 
-show_object(result)
-show_object(casing, options={"color": "red"})
+if "show_object" in globals():
+	show_object(result)
+	show_object(casing, options={"color": "red"})
 cq.exporters.export(result, "stand.stl")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# Profile where a CadQuery script spends its build time, without editing it.
+# Every function defined alongside the script (feature constructors like
+# snap_fits or hose_cutout, and util.py) and every CadQuery modelling
+# operation (fillet, cut, union, extrude, text, ...) is timed, and the calls
+# are printed as a tree with total and self time and call counts. Optionally
+# also writes a Chrome trace (open in chrome://tracing or ui.perfetto.dev).
+#
+# Usage: python3 scripts/profile_build.py <script.py> [--trace out.json] [--min-percent 0.5] [--no-cache]
+
+import argparse
+import builtins
+import json
+import os
+import runpy
+import sys
+import time
+
+import cadquery as cq
+
+# Shape methods worth seeing on their own; Workplane methods are all timed
+shape_ops = {
+    "fuse", "cut", "intersect", "clean", "fillet", "chamfer", "shell", "split",
+    "mesh", "tessellate", "exportStl", "exportStep", "exportBin", "importBin",
+    "extrudeLinear", "revolve", "sweep", "twistExtrude", "makeShell", "makeSolid",
+}
+
+class Node:
+    def __init__(self):
+        self.total = 0.0
+        self.calls = 0
+        self.children = {}
+
+class BuildProfiler:
+    def __init__(self, script_dir):
+        self.script_dir = os.path.realpath(script_dir)
+        self.cq_dir = os.path.dirname(os.path.realpath(cq.__file__))
+        self.labels = {}
+        self.root = Node()
+        self.stack = [(self.root, 0.0, None)]
+        self.events = []
+        self.start = None
+
+    def label(self, code):
+        name = code.co_name
+        if name.startswith("<") and name != "<lambda>" or code.co_filename.startswith("<"):
+            return None
+        path = os.path.realpath(code.co_filename)
+        qualname = code.co_qualname
+        if path.startswith(self.script_dir + os.sep):
+            # Skip decorator plumbing like BrepCache's wrapper, so that
+            # cached features nest directly under their caller
+            if qualname.endswith("<locals>.wrapper"):
+                return None
+            return f"{os.path.basename(path)[:-3]}.{qualname}"
+        if path.startswith(self.cq_dir + os.sep) and name.isidentifier() and not name.startswith("_"):
+            cls = qualname.split(".")[0]
+            if cls == "Workplane" or name in shape_ops:
+                return qualname
+        return None
+
+    def hook(self, frame, event, arg):
+        if event == "call":
+            code = frame.f_code
+            try:
+                label = self.labels[code]
+            except KeyError:
+                label = self.labels[code] = self.label(code)
+            if label is not None:
+                parent = self.stack[-1][0]
+                node = parent.children.get(label)
+                if node is None:
+                    node = parent.children[label] = Node()
+                self.stack.append((node, time.perf_counter(), frame))
+        elif event == "return" and self.stack[-1][2] is frame:
+            end = time.perf_counter()
+            node, start, _ = self.stack.pop()
+            node.total += end - start
+            node.calls += 1
+            self.events.append((self.labels[frame.f_code], start, end))
+
+    def run(self, script):
+        self.start = time.perf_counter()
+        sys.setprofile(self.hook)
+        try:
+            runpy.run_path(script, run_name="__main__")
+        finally:
+            sys.setprofile(None)
+            self.root.total = time.perf_counter() - self.start
+            self.root.calls = 1
+
+    def report(self, min_percent):
+        threshold = self.root.total * min_percent / 100
+        print(f"{'total s':>9} {'self s':>9} {'calls':>7}")
+        def show(name, node, depth):
+            own = node.total - sum(c.total for c in node.children.values())
+            print(f"{node.total:9.3f} {own:9.3f} {node.calls:7d}  {'  ' * depth}{name}")
+            for child_name, child in sorted(node.children.items(), key=lambda c: -c[1].total):
+                if child.total >= threshold:
+                    show(child_name, child, depth + 1)
+        show("<script>", self.root, 0)
+
+    def write_trace(self, fname):
+        events = [
+            {
+                "name": name, "ph": "X", "pid": 0, "tid": 0,
+                "ts": (start - self.start) * 1e6, "dur": (end - start) * 1e6,
+            }
+            for name, start, end in self.events
+        ]
+        with open(fname, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the build of a CadQuery script")
+    parser.add_argument("script")
+    parser.add_argument("--trace", help="write a Chrome trace JSON file")
+    parser.add_argument("--min-percent", type=float, default=0.5, help="hide calls below this share of the total")
+    parser.add_argument("--no-cache", action="store_true", help="disable util.feature_cache, to profile a cold build")
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    trace = args.trace and os.path.abspath(args.trace)
+    script_dir = os.path.dirname(script)
+    sys.path.insert(0, script_dir)
+    os.chdir(script_dir)
+    if os.path.exists(os.path.join(script_dir, "util.py")):
+        import util
+        util.feature_cache.enabled = not args.no_cache
+        # Profile everything in this process rather than in pool workers
+        build_parts = util.build_parts
+        util.build_parts = lambda names=None, parallel=True, **kwargs: build_parts(names, False, **kwargs)
+
+    # For scripts which call show_object unconditionally. A builtin rather
+    # than a global, so scripts checking globals() still run headless.
+    builtins.show_object = lambda *args, **kwargs: None
+
+    profiler = BuildProfiler(script_dir)
+    try:
+        profiler.run(script)
+    finally:
+        profiler.report(args.min_percent)
+        if trace:
+            profiler.write_trace(trace)
+
+if __name__ == "__main__":
+    main()
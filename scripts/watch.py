@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Re-run a CadQuery script every time it (or a module next to it) changes,
+# replacing watch_py.sh. The interpreter stays warm between runs, so cadquery
+# is only imported once and results from util.feature_cache are kept in memory.
+# Need to install inotify-tools (on Ubuntu) for instant rebuilds, otherwise
+# falls back to polling. I also recommend installing fstl as an excellent STL
+# viewer that can auto-watch files for updates.
+
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+
+def sources(script_dir):
+    return {
+        os.path.join(script_dir, f): os.stat(os.path.join(script_dir, f)).st_mtime
+        for f in os.listdir(script_dir) if f.endswith(".py")
+    }
+
+def wait_for_change(script_dir, mtimes):
+    if shutil.which("inotifywait"):
+        subprocess.run(["inotifywait", "-qq", "-e", "close_write", *mtimes])
+    while sources(script_dir) == mtimes:
+        time.sleep(0.25)
+
+def forget_changed_modules(mtimes, new_mtimes):
+    changed = {p for p in new_mtimes if mtimes.get(p) != new_mtimes[p]}
+    for name, module in list(sys.modules.items()):
+        if getattr(module, "__file__", None) in changed:
+            del sys.modules[name]
+
+def run(script, import_time):
+    try:
+        import util
+    except Exception:
+        traceback.print_exc()
+        print("\a", end="", flush=True)
+        return
+    util.registered_parts.clear()
+    util.phase_times.clear()
+    # Build in this process rather than in pool workers, so the results of
+    # util.feature_cache stay in memory for the next run
+    build_parts = util.build_parts
+    util.build_parts = lambda names=None, parallel=True, **kwargs: build_parts(names, False, **kwargs)
+    start = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name="__main__")
+        ok = True
+    except Exception:
+        traceback.print_exc()
+        ok = False
+    finally:
+        util.build_parts = build_parts
+    total = time.perf_counter() - start
+    times = util.phase_times
+    # Scripts which don't register parts only report tessellate/export
+    build = times["build"] or total - times["tessellate"] - times["export"]
+    print(
+        f"import {import_time:.2f} s   build {build:.2f} s   tessellate {times['tessellate']:.2f} s"
+        f"   export {times['export']:.2f} s   {times['triangles']} triangles   ({util.feature_cache.stats()})"
+    )
+    print("OK" if ok else "\a", end="\n" if ok else "", flush=True)
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(f"Usage: {sys.argv[0]} <script.py>")
+    script = os.path.abspath(sys.argv[1])
+    script_dir = os.path.dirname(script)
+    sys.path.insert(0, script_dir)
+    os.chdir(script_dir)
+    start = time.perf_counter()
+    import cadquery
+    has_util = os.path.exists(os.path.join(script_dir, "util.py"))
+    if has_util:
+        import util
+    import_time = time.perf_counter() - start
+
+    mtimes = sources(script_dir)
+    while True:
+        print("\033[2J\033[H", end="")
+        print(f"Watching {script} for changes. ^C to exit")
+        print("Running...")
+        if has_util:
+            run(script, import_time)
+        else:
+            start = time.perf_counter()
+            try:
+                runpy.run_path(script, run_name="__main__")
+                print(f"import {import_time:.2f} s   run {time.perf_counter() - start:.2f} s\nOK")
+            except Exception:
+                traceback.print_exc()
+                print("\a", end="", flush=True)
+        import_time = 0.0
+        wait_for_change(script_dir, mtimes)
+        new_mtimes = sources(script_dir)
+        forget_changed_modules(mtimes, new_mtimes)
+        mtimes = new_mtimes
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,78 @@
+# BrepCache must not return stale geometry when a module-level shape, a
+# class or boolean_options changes, and must not cache a function whose
+# globals it can't hash.
+#
+# Usage: python3 -m pytest tests
+
+import os
+import runpy
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon"))
+
+import cadquery as cq
+import util
+
+script = """
+import cadquery as cq
+from util import BrepCache, Feature
+
+cache = BrepCache(cache_dir, 1 << 20)
+shape = cq.Workplane("XY").box(1, 1, 1)
+
+class Scale:
+    def size(self):
+        return {size}
+
+@cache
+def moved():
+    return Feature(shape.translate((1, 0, 0)))
+
+@cache
+def scaled():
+    return Feature(cq.Workplane("XY").box(Scale().size(), 1, 1))
+
+thing = object()
+
+@cache
+def unhashable():
+    thing
+    return Feature(cq.Workplane("XY").box(1, 1, 1))
+"""
+
+def load(tmp_path, size=1):
+    path = tmp_path / "script.py"
+    path.write_text(script.format(size=size))
+    return runpy.run_path(str(path), {"cache_dir": str(tmp_path / "cache")})
+
+def volume(feature):
+    return feature.resolve().val().Volume()
+
+def test_module_shape(tmp_path):
+    moved = load(tmp_path)["moved"]
+    assert round(volume(moved())) == 1
+    moved.__wrapped__.__globals__["shape"] = cq.Workplane("XY").box(5, 5, 5)
+    assert round(volume(moved())) == 125
+
+def test_class_source(tmp_path):
+    assert round(volume(load(tmp_path)["scaled"]())) == 1
+    assert round(volume(load(tmp_path, 3)["scaled"]())) == 3
+    scaled = load(tmp_path, 3)["scaled"]
+    assert round(volume(scaled())) == 3
+    assert scaled.cache.hits == 1
+
+def test_boolean_options(tmp_path):
+    moved = load(tmp_path)["moved"]
+    key = moved.cache.key(moved, (), {})
+    util.boolean_options["fuzzy"] = 1e-5
+    try:
+        assert moved.cache.key(moved, (), {}) != key
+    finally:
+        util.boolean_options["fuzzy"] = 0
+
+def test_unhashable(tmp_path, capsys):
+    unhashable = load(tmp_path)["unhashable"]
+    assert round(volume(unhashable())) == 1
+    assert round(volume(unhashable())) == 1
+    assert unhashable.cache.hits == unhashable.cache.misses == 0
+    assert "not caching unhashable()" in capsys.readouterr().out
@@ -0,0 +1,57 @@
+# clip() must trim a part the same way whichever path resolves it: with
+# resolve_features(), or after Feature.combine(), combine_features() or a
+# LazyFeature's flatten(), which fuse negatives before the final cut.
+#
+# Usage: python3 -m pytest tests
+
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon"))
+
+import cadquery as cq
+import util
+from util import Feature, clip, combine_features, pattern, resolve_features
+
+# 10 mm cube centred on the origin, with a 2 mm radius hole through it
+def drilled_cube():
+    return Feature(
+        cq.Workplane("XY").box(10, 10, 10),
+        cq.Workplane("XY").circle(2).extrude(20, both=True)
+    )
+
+def check(wp, volume):
+    assert wp.val().isValid()
+    assert wp.val().Volume() == pytest.approx(volume, rel=1e-6)
+
+# The top half of the drilled cube
+half = (1000 - math.pi * 2 ** 2 * 10) / 2
+
+def test_resolve_features():
+    check(resolve_features(drilled_cube(), clip()), half)
+
+def test_feature_combine():
+    check(drilled_cube().combine(clip()).resolve(), half)
+    check(clip().combine(drilled_cube()).resolve(), half)
+
+def test_combine_features():
+    check(combine_features(drilled_cube(), clip()).resolve(), half)
+
+def test_two_clips():
+    slab = combine_features(drilled_cube(), clip(), clip((0, 0, 3), (0, 0, -1)))
+    check(slab.resolve(), half * 3 / 5)
+    check(slab.combine(Feature(None, cq.Workplane("XY").box(1, 1, 1).translate((4, 4, 1)))).resolve(), half * 3 / 5 - 1)
+
+def test_pattern():
+    check(resolve_features(drilled_cube(), pattern(clip(), [cq.Location(cq.Vector(0, 0, 0))])), half)
+
+def test_lazy():
+    util.lazy_features = True
+    try:
+        check(drilled_cube().combine(clip()).resolve(), half)
+        check(drilled_cube().combine(clip()).flatten().resolve(), half)
+    finally:
+        util.lazy_features = False
@@ -0,0 +1,53 @@
+# Copies placed by pattern() must cut a part correctly when they touch or
+# overlap, which OCCT gets wrong if they reach a boolean as one Compound.
+#
+# Usage: python3 -m pytest tests
+
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aircon"))
+
+import cadquery as cq
+import util
+from util import Feature, grid_locations, pattern, polar_locations, resolve_features
+
+def slab():
+    return Feature(cq.Workplane("XY").box(60, 60, 4))
+
+# 10 mm square pocket, 2 mm deep, in the top of the slab
+def pocket():
+    return Feature(cq.Workplane("XY").box(10, 10, 2, centered=(True, True, False))).invert()
+
+def check(wp, volume):
+    assert wp.val().isValid()
+    assert wp.val().Volume() == pytest.approx(volume, rel=1e-6)
+
+# Apart, touching and overlapping pockets, with the area of their union
+@pytest.mark.parametrize("spacing, area", [(12, 9 * 10 ** 2), (10, 30 ** 2), (9, 28 ** 2)])
+def test_grid_pockets(spacing, area):
+    pocketed = 60 * 60 * 4 - area * 2
+    pockets = pattern(pocket(), grid_locations(spacing, spacing, 3, 3))
+    check(resolve_features(slab(), pockets), pocketed)
+    check(slab().combine(pockets).resolve(), pocketed)
+
+def test_overlapping_polar():
+    plate = Feature(cq.Workplane("XY").box(40, 40, 4))
+    hole = Feature(cq.Workplane("XY").circle(5).extrude(10, both=True)).invert()
+    locations = polar_locations(3, 6)
+    serial = plate.resolve()
+    for loc in locations:
+        serial = serial.cut(cq.Workplane("XY").circle(5).extrude(10, both=True).val().moved(loc))
+    check(resolve_features(plate, pattern(hole, locations)), serial.val().Volume())
+    assert serial.val().Volume() < 40 * 40 * 4 - math.pi * 5 ** 2 * 4
+
+def test_lazy():
+    util.lazy_features = True
+    try:
+        pockets = pattern(pocket(), grid_locations(9, 9, 3, 3))
+        check(slab().combine(pockets).resolve(), 60 * 60 * 4 - 28 ** 2 * 2)
+    finally:
+        util.lazy_features = False